@@ -0,0 +1,96 @@
+import itertools
+import json
+from datetime import datetime
+
+from scraper.exports import EXPORTERS, iter_gzip
+from scraper.results import shared_store
+from scraper.web import get_header, get_query
+
+def handler(request, context):
+    # Handle CORS preflight
+    if request.get('method') == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, x-api-key'
+            },
+            'body': ''
+        }
+    
+    if request.get('method') != 'GET':
+        return {
+            'statusCode': 405,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Method not allowed'})
+        }
+    
+    query = get_query(request)
+    fmt = query.get('format', 'csv')
+    if fmt not in EXPORTERS:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Unsupported format: {fmt}'})
+        }
+    
+    # Exporting the whole store takes an explicit ?all=1
+    batch = query.get('batch')
+    if not batch and query.get('all') not in ('1', 'true'):
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Please provide a batch'})
+        }
+    
+    # The first row is read up front: a batch this instance never stored
+    # (each serverless function has its own /tmp) is a 404, so the page
+    # falls back to exporting its own table instead of an empty file
+    rows = shared_store().iter_results(batch=batch or None)
+    first = next(rows, None)
+    if first is None:
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'No results for this batch'})
+        }
+    
+    exporter, content_type = EXPORTERS[fmt]
+    filename = f'pricing_data_{datetime.now().strftime("%Y-%m-%d")}.{fmt}'
+    headers = {
+        'Content-Type': content_type,
+        'Access-Control-Allow-Origin': '*',
+        'Cache-Control': 'no-store'
+    }
+    
+    # No Content-Length: the body is an iterator and goes out chunked
+    body = exporter(itertools.chain([first], rows))
+    if query.get('gzip') in ('1', 'true'):
+        # Explicit .gz download
+        body = iter_gzip(body)
+        filename += '.gz'
+        headers['Content-Type'] = 'application/gzip'
+    elif 'gzip' in get_header(request, 'accept-encoding').lower():
+        body = iter_gzip(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': body
+    }
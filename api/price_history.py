@@ -0,0 +1,92 @@
+import json
+
+from scraper.results import shared_store
+from scraper.web import get_query
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+def handler(request, context):
+    # Handle CORS preflight
+    if request.get('method') == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, x-api-key'
+            },
+            'body': ''
+        }
+    
+    if request.get('method') != 'GET':
+        return {
+            'statusCode': 405,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Method not allowed'})
+        }
+    
+    try:
+        query = get_query(request)
+        domain = query.get('domain', '').strip()
+        since = query.get('since')
+        until = query.get('until')
+        limit = int(query.get('limit', DEFAULT_LIMIT))
+        if not 1 <= limit <= MAX_LIMIT:
+            # SQLite reads a negative LIMIT as no limit at all
+            raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+        
+        store = shared_store()
+        if domain and query.get('latest') in ('1', 'true'):
+            # Newest result only
+            latest = store.latest(domain)
+            results = [latest] if latest else []
+        elif domain:
+            # Time series of one domain, newest first
+            results = list(store.history(domain, since=since, until=until, limit=limit))
+        else:
+            # Range filters across all domains
+            results = list(store.query(
+                plan=query.get('plan'),
+                currency=query.get('currency'),
+                min_price=float(query['min_price']) if query.get('min_price') else None,
+                max_price=float(query['max_price']) if query.get('max_price') else None,
+                since=since,
+                until=until,
+                limit=limit
+            ))
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'results': results,
+                'total': len(results)
+            })
+        }
+    
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(e)})
+        }
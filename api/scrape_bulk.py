@@ -1,8 +1,19 @@
 import json
-import requests
-from bs4 import BeautifulSoup
+import os
 import re
-from datetime import datetime
+import uuid
+
+from scraper.deadline import Deadline
+from scraper.engine import scrape_many, shared_scrape
+from scraper.results import save_results
+from scraper.uploads import index_from_request
+from scraper.web import get_query
+
+# Seconds of work per invocation, kept below the platform's function
+# timeout so the response is sent before the function is killed
+BUDGET = float(os.environ.get('SCRAPE_BULK_BUDGET', 8))
+CONCURRENCY = 8
+BATCH_RE = re.compile(r'^[0-9a-f]{32}$')
 
 def handler(request, context):
     # Handle CORS preflight
@@ -28,17 +39,10 @@ def handler(request, context):
         }
     
     try:
-        # Parse request body
-        body = request.get('body', '{}')
-        if isinstance(body, str):
-            data = json.loads(body)
-        else:
-            data = body
-        
-        urls_text = data.get('urls', '').strip()
-        urls = [url.strip() for url in urls_text.split('\n') if url.strip()]
+        deadline = Deadline(BUDGET)
+        index = index_from_request(request)
         
-        if not urls:
+        if not index.total:
             return {
                 'statusCode': 400,
                 'headers': {
@@ -48,59 +52,24 @@ def handler(request, context):
                 'body': json.dumps({'error': 'No domains provided'})
             }
         
-        # Limit to 2 domains for serverless function
-        urls = urls[:2]
-        
+        # Scrape as many domains as fit in the budget; the rest are returned
+        # as pending for a follow-up call
+        finished = set()
         results = []
-        for url in urls:
-            try:
-                # Add protocol if missing
-                if not url.startswith(('http://', 'https://')):
-                    url = 'https://' + url
-                
-                # Simple scraping
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                response = requests.get(url, headers=headers, timeout=8)
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Extract basic pricing info
-                pricing_data = {
-                    'url': url,
-                    'plan_name': '',
-                    'price': '',
-                    'billing_period': '',
-                    'features': [],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                
-                # Look for price patterns
-                text = soup.get_text()
-                price_match = re.search(r'\$[\d,]+(?:\.\d{2})?', text)
-                if price_match:
-                    pricing_data['price'] = price_match.group()
-                
-                # Look for plan names
-                plan_patterns = ['basic', 'starter', 'pro', 'premium', 'enterprise']
-                for pattern in plan_patterns:
-                    if re.search(pattern, text, re.IGNORECASE):
-                        pricing_data['plan_name'] = pattern.title()
-                        break
-                
-                results.append(pricing_data)
-                
-            except Exception as e:
-                results.append({
-                    'url': url,
-                    'plan_name': '',
-                    'price': '',
-                    'billing_period': '',
-                    'features': [],
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'error': str(e)
-                })
+        for result in scrape_many(index.urls(), concurrency=CONCURRENCY, timeout=8,
+                                  scrape=shared_scrape(), deadline=deadline):
+            finished.add(result['url'])
+            results.extend(index.expand(result))
+        results.extend(index.invalid_results())
+        pending = [rows[0][1] for url, rows in index.rows.items() if url not in finished]
+        
+        # Keep the results for /api/download_csv; follow-up calls pass
+        # ?batch= to add to the same one
+        batch = get_query(request).get('batch', '')
+        if not BATCH_RE.match(batch):
+            batch = uuid.uuid4().hex
+        if not save_results(results, batch=batch):
+            batch = None
         
         return {
             'statusCode': 200,
@@ -109,9 +78,11 @@ def handler(request, context):
                 'Access-Control-Allow-Origin': '*'
             },
             'body': json.dumps({
-                'message': f'Scraped {len(results)} urls',
+                'message': f'Scraped {len(results)} urls, {len(pending)} pending',
                 'results': results,
-                'total': len(results)
+                'total': len(results),
+                'pending': pending,
+                'batch': batch
             })
         }
         
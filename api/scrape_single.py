@@ -1,8 +1,33 @@
 import json
-import requests
-from bs4 import BeautifulSoup
-import re
-from datetime import datetime
+import uuid
+
+from scraper.breaker import BREAKER
+from scraper.cache import ResultCache
+from scraper.challenge import check_response
+from scraper.extract import extract_pricing
+from scraper.fingerprints import check_page
+from scraper.hedge import hedged_fetch
+from scraper.normalize import canonicalize
+from scraper.results import save_results
+from scraper.web import cacheable_json_response, cacheable_result, get_query
+
+# Recent results per url, reused across warm invocations of this function
+RESULT_CACHE = ResultCache()
+
+
+def scrape(url):
+    with BREAKER.attempt(url):
+        response = hedged_fetch(url, timeout=10)
+        check_response(response.status_code, response.headers, response.content)
+    check_page(response, timeout=10)
+    pricing_data = extract_pricing(url, response.content, response.headers)
+    
+    # Keep the result for /api/download_csv
+    batch = uuid.uuid4().hex
+    if not save_results([pricing_data], batch=batch):
+        batch = None
+    return pricing_data, batch
+
 
 def handler(request, context):
     # Handle CORS preflight
@@ -11,13 +36,13 @@ def handler(request, context):
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
                 'Access-Control-Allow-Headers': 'Content-Type, x-api-key'
             },
             'body': ''
         }
     
-    if request.get('method') != 'POST':
+    if request.get('method') not in ('GET', 'POST'):
         return {
             'statusCode': 405,
             'headers': {
@@ -28,12 +53,16 @@ def handler(request, context):
         }
     
     try:
-        # Parse request body
-        body = request.get('body', '{}')
-        if isinstance(body, str):
-            data = json.loads(body)
+        if request.get('method') == 'GET':
+            # Edge-cacheable form: /api/scrape_single?url=...
+            data = get_query(request)
         else:
-            data = body
+            # Parse request body
+            body = request.get('body', '{}')
+            if isinstance(body, str):
+                data = json.loads(body)
+            else:
+                data = body
         
         url = data.get('url', '').strip()
         
@@ -47,40 +76,22 @@ def handler(request, context):
                 'body': json.dumps({'error': 'Please provide a url'})
             }
         
-        # Add protocol if missing
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        # Simple scraping
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract basic pricing info
-        pricing_data = {
-            'url': url,
-            'plan_name': '',
-            'price': '',
-            'billing_period': '',
-            'features': [],
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        # www. is kept: some sites only answer on one of the two hosts
+        url = canonicalize(url, strip_www=False)
+        if url is None:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': 'Invalid url'})
+            }
         
-        # Look for price patterns
-        text = soup.get_text()
-        price_match = re.search(r'\$[\d,]+(?:\.\d{2})?', text)
-        if price_match:
-            pricing_data['price'] = price_match.group()
+        pricing_data, batch = RESULT_CACHE.get(url, lambda: scrape(url))
         
-        # Look for plan names
-        plan_patterns = ['basic', 'starter', 'pro', 'premium', 'enterprise']
-        for pattern in plan_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                pricing_data['plan_name'] = pattern.title()
-                break
+        if request.get('method') == 'GET':
+            return cacheable_json_response(request, cacheable_result(pricing_data))
         
         return {
             'statusCode': 200,
@@ -91,7 +102,8 @@ def handler(request, context):
             'body': json.dumps({
                 'success': True,
                 'data': pricing_data,
-                'error': None
+                'error': None,
+                'batch': batch
             })
         }
         
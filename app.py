@@ -0,0 +1,68 @@
+import json
+import os
+
+# The handlers import these lazily to keep serverless cold starts short;
+# a long-running server loads them up front so forked workers share them
+import bs4  # noqa: F401
+import requests  # noqa: F401
+from flask import Flask, Response, request, send_from_directory
+
+from scraper.uploads import UPLOAD_TYPES
+from scraper.web import ROOT, load_handler, load_routes
+
+PUBLIC_DIR = os.path.join(ROOT, 'public')
+
+app = Flask(__name__, static_folder=None)
+
+
+def to_handler_request():
+    content_type = request.headers.get('Content-Type', '').lower()
+    if content_type.startswith(UPLOAD_TYPES):
+        # Uploads are parsed as they arrive instead of being read up front
+        body = request.stream
+    else:
+        body = request.get_data(as_text=True) or '{}'
+    return {
+        'method': request.method,
+        'path': request.full_path,
+        'headers': dict(request.headers),
+        'query': request.args.to_dict(),
+        'body': body
+    }
+
+
+def to_response(result):
+    body = result.get('body', '')
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body)
+    return Response(body, status=result.get('statusCode', 200), headers=result.get('headers', {}))
+
+
+def make_view(handler):
+    def view():
+        return to_response(handler(to_handler_request(), None))
+    return view
+
+
+def register_routes():
+    # Handlers are imported here, before gunicorn --preload forks
+    for src, dest in load_routes():
+        if dest.endswith('.py'):
+            endpoint = dest.strip('/').replace('/', '_')[:-3]
+            app.add_url_rule(src, endpoint, make_view(load_handler(dest)),
+                             methods=['GET', 'POST', 'OPTIONS'])
+        elif dest.startswith('/public/'):
+            filename = dest[len('/public/'):]
+            app.add_url_rule(src, 'static_' + filename,
+                             lambda filename=filename: send_from_directory(PUBLIC_DIR, filename))
+
+
+register_routes()
+
+
+if __name__ == '__main__':
+    # The debugger executes code for whoever reaches it, so it is opt-in
+    # (FLASK_DEBUG=1) and then only listens on localhost
+    debug = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true')
+    app.run(debug=debug, host='127.0.0.1' if debug else '0.0.0.0',
+            port=int(os.environ.get('PORT', 5000)))
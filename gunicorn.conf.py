@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Scraping is I/O bound: a few processes with many threads each. Threads
+# keep their pooled HTTP sessions and store connections between requests.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Import the app and all handlers once in the master, then fork
+preload_app = True
+
+# Keep idle client connections open longer than gunicorn's 2s default so
+# browsers and load balancers can reuse them; must stay below the load
+# balancer's own idle timeout
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 65))
+
+# scrape_bulk may run for a while; exports are streamed
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+
+# Recycle workers now and then to bound memory growth, staggered so they
+# do not all restart at once
+max_requests = 5000
+max_requests_jitter = 500
+
+# Heartbeat files on tmpfs instead of a possibly slow disk
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = '-'
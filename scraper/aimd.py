@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+
+from .breaker import TIMEOUT, classify, host_of
+from .latency import LATENCY
+
+# Per-host limits start here and may grow to HOST_MAXIMUM
+HOST_INITIAL = 2
+HOST_MAXIMUM = 8
+# A fetch this many times slower than its host's average counts as a sign
+# of overload, as do timeouts and 429/503 responses
+SLOW_FACTOR = 3.0
+# Shares of recent fetches (EWMA) that have to be overloaded before the
+# global limit backs off; a single host's trouble only shrinks its own
+GLOBAL_THRESHOLD = 0.2
+SIGNAL_ALPHA = 0.1
+HISTORY = 1000
+
+
+def overloaded(url, elapsed, error):
+    # Only errors that grow with load count: a dead or refusing host is the
+    # breaker's business, not a reason to slow everything down
+    if error:
+        if '(skipped:' in error:
+            return False
+        return classify(RuntimeError(error)) == TIMEOUT or error in ('HTTP 429', 'HTTP 503')
+    expected = LATENCY.mean_total(url)
+    return expected is not None and elapsed > SLOW_FACTOR * expected
+
+
+class AIMD:
+    # One additive-increase, multiplicative-decrease limit: +1 per `limit`
+    # successes, halved on overload. Overloads within one window of `limit`
+    # completions after a decrease count once, so a burst of timeouts from
+    # requests that were already in flight does not collapse the limit.
+
+    def __init__(self, initial, minimum=1, maximum=None, decrease=0.5):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.value = float(min(max(initial, minimum), self.maximum))
+        self.decrease = decrease
+        self.since_decrease = self.value
+
+    @property
+    def limit(self):
+        return int(self.value)
+
+    def success(self):
+        self.since_decrease += 1
+        self.value = min(self.maximum, self.value + 1 / self.value)
+
+    def overload(self):
+        self.since_decrease += 1
+        if self.since_decrease < self.value:
+            return False
+        self.value = max(self.minimum, self.value * self.decrease)
+        self.since_decrease = 0
+        return True
+
+
+class ConcurrencyLimiter:
+    # In-flight limits for the bulk engine, one global and one per host, each
+    # tuned by AIMD from the outcome of every fetch
+
+    def __init__(self, initial=16, maximum=64, host_initial=HOST_INITIAL,
+                 host_maximum=HOST_MAXIMUM, clock=time.monotonic):
+        self.total = AIMD(initial, maximum=maximum)
+        self.host_initial = host_initial
+        self.host_maximum = host_maximum
+        self.hosts = {}
+        self.inflight = 0
+        self.signal = 0.0
+        self.clock = clock
+        self.started = clock()
+        self.history = deque([(0.0, self.total.limit)], maxlen=HISTORY)
+        self.stats = {'completed': 0, 'overloaded': 0, 'decreases': 0,
+                      'lowest': self.total.limit, 'highest': self.total.limit}
+        self.lock = threading.Lock()
+
+    @property
+    def maximum(self):
+        return self.total.maximum
+
+    @property
+    def limit(self):
+        return self.total.limit
+
+    def has_room(self):
+        with self.lock:
+            return self.inflight < self.total.limit
+
+    def acquire(self, url):
+        # Takes a slot for the url's host if both limits allow it
+        host = host_of(url)
+        with self.lock:
+            if self.inflight >= self.total.limit:
+                return False
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = [AIMD(self.host_initial,
+                                                 maximum=self.host_maximum), 0]
+            if state[1] >= state[0].limit:
+                return False
+            state[1] += 1
+            self.inflight += 1
+            return True
+
+    def release(self, url, elapsed=None, error=None):
+        # elapsed None: the url never ran (out of time), no signal either way
+        host = host_of(url)
+        signal = elapsed is not None and overloaded(url, elapsed, error)
+        with self.lock:
+            # Only grow a limit that was actually reached; an input that
+            # cannot keep the engine busy says nothing about capacity
+            busy = self.inflight >= self.total.limit
+            self.inflight -= 1
+            state = self.hosts[host]
+            limit = state[0]
+            state[1] -= 1
+            if elapsed is not None:
+                if signal:
+                    limit.overload()
+                elif state[1] + 1 >= limit.limit:
+                    limit.success()
+            if not state[1] and limit.value >= self.host_initial:
+                # Idle hosts at or above their starting limit need no state
+                del self.hosts[host]
+            if elapsed is None:
+                return
+
+            self.stats['completed'] += 1
+            self.signal += SIGNAL_ALPHA * ((1.0 if signal else 0.0) - self.signal)
+            before = self.total.limit
+            if signal:
+                self.stats['overloaded'] += 1
+                if self.signal > GLOBAL_THRESHOLD and self.total.overload():
+                    self.stats['decreases'] += 1
+            elif busy:
+                self.total.success()
+            after = self.total.limit
+            if after != before:
+                self.history.append((round(self.clock() - self.started, 3), after))
+                self.stats['lowest'] = min(self.stats['lowest'], after)
+                self.stats['highest'] = max(self.stats['highest'], after)
+
+    def metrics(self):
+        with self.lock:
+            throttled = {host: limit.limit for host, (limit, _) in self.hosts.items()
+                         if limit.value < self.host_initial}
+            return dict(self.stats, limit=self.total.limit, maximum=self.total.maximum,
+                        inflight=self.inflight, overload_share=round(self.signal, 3),
+                        history=list(self.history), throttled_hosts=throttled)
@@ -0,0 +1,264 @@
+import asyncio
+import ssl
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from .breaker import BREAKER
+from .cache import AsyncResultCache
+from .challenge import check_response
+from .extract import empty_result, extract_pricing
+from .fetch import HEADERS, normalize_url
+from .fingerprints import (NotFoundPages, check_content, may_be_soft_404, not_found_url,
+                           page_simhash, site_of)
+from .latency import LATENCY
+from .resolve import DNS, RESOLVE_ERRORS, dns_error, hostname_of
+
+MAX_REDIRECTS = 5
+MAX_BODY = 5 * 1024 * 1024
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class FetchError(Exception):
+    pass
+
+
+def make_ssl_context():
+    try:
+        import certifi
+        return ssl.create_default_context(cafile=certifi.where())
+    except ImportError:
+        return ssl.create_default_context()
+
+
+SSL_CONTEXT = make_ssl_context()
+
+
+async def read_headers(reader):
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def read_chunked(reader, max_bytes):
+    parts = []
+    size = 0
+    while True:
+        line = await reader.readline()
+        chunk_size = int(line.split(b';')[0].strip() or b'0', 16)
+        if chunk_size == 0:
+            await read_headers(reader)
+            return b''.join(parts)
+        size += chunk_size
+        if size > max_bytes:
+            raise FetchError('Response too large')
+        parts.append(await reader.readexactly(chunk_size))
+        await reader.readline()
+
+
+async def read_body(reader, status, headers, max_bytes):
+    if status in (204, 304) or 100 <= status < 200:
+        return b''
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = await read_chunked(reader, max_bytes)
+    elif 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length > max_bytes:
+            raise FetchError('Response too large')
+        body = await reader.readexactly(length)
+    else:
+        # Delimited by the connection closing; read() returns whatever has
+        # arrived, so keep reading until EOF
+        parts = []
+        size = 0
+        while True:
+            part = await reader.read(max_bytes + 1 - size)
+            if not part:
+                break
+            parts.append(part)
+            size += len(part)
+            if size > max_bytes:
+                raise FetchError('Response too large')
+        body = b''.join(parts)
+
+    encoding = headers.get('content-encoding', '').lower()
+    if encoding in ('gzip', 'x-gzip'):
+        body = decompress(body, 47, max_bytes)
+    elif encoding == 'deflate':
+        try:
+            body = decompress(body, zlib.MAX_WBITS, max_bytes)
+        except zlib.error:
+            body = decompress(body, -zlib.MAX_WBITS, max_bytes)
+    return body
+
+
+def decompress(body, wbits, max_bytes):
+    # The max_bytes limit holds for the decoded body too, so a small
+    # compressed response cannot expand without bound
+    decoder = zlib.decompressobj(wbits)
+    body = decoder.decompress(body, max_bytes + 1)
+    if len(body) > max_bytes:
+        raise FetchError('Response too large')
+    return body + decoder.flush()
+
+
+async def open_first(addresses, port, https, host):
+    # Tries each address in turn, as socket.create_connection does
+    error = None
+    for address in addresses:
+        try:
+            return await asyncio.open_connection(
+                address, port, ssl=SSL_CONTEXT if https else None,
+                server_hostname=host if https else None
+            )
+        except OSError as e:
+            error = e
+    raise error if error is not None else OSError(f'No addresses for {host}')
+
+
+async def request_once(url, max_bytes):
+    # Returns (status, headers, body, seconds to the status line)
+    started = time.monotonic()
+    parts = urlsplit(url)
+    https = parts.scheme == 'https'
+    host = parts.hostname
+    port = parts.port or (443 if https else 80)
+    # Connect to the address resolved ahead of time when there is one; TLS
+    # still verifies against the hostname
+    addresses = await asyncio.wrap_future(DNS.submit(host))
+    reader, writer = await open_first(addresses, port, https, host)
+    try:
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        lines = [
+            f'GET {path} HTTP/1.1',
+            f'Host: {parts.netloc.rsplit("@", 1)[-1]}',
+            f'User-Agent: {HEADERS["User-Agent"]}',
+            'Accept: */*',
+            'Accept-Encoding: gzip, deflate',
+            'Connection: close',
+        ]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = (await reader.readline()).decode('latin-1').split(None, 2)
+        if len(status_line) < 2 or not status_line[0].startswith('HTTP/'):
+            raise FetchError('Invalid HTTP response')
+        status = int(status_line[1])
+        ttfb = time.monotonic() - started
+        headers = await read_headers(reader)
+        body = await read_body(reader, status, headers, max_bytes)
+        return status, headers, body, ttfb
+    finally:
+        writer.close()
+
+
+async def fetch_async(url, timeout=10, max_redirects=MAX_REDIRECTS, max_bytes=MAX_BODY):
+    # Non-blocking GET following redirects; returns (final url, status,
+    # headers, body). One connection per request, closed afterwards.
+    # `timeout` caps the host's adaptive timeout for the whole fetch.
+    started = time.monotonic()
+    _, limit = LATENCY.timeouts(url, timeout)
+
+    async def follow(target):
+        for _ in range(max_redirects + 1):
+            status, headers, body, ttfb = await request_once(target, max_bytes)
+            if status in REDIRECT_STATUSES and headers.get('location'):
+                target = urljoin(target, headers['location'])
+                continue
+            LATENCY.record(url, ttfb, time.monotonic() - started)
+            return target, status, headers, body
+        raise FetchError('Too many redirects')
+
+    try:
+        return await asyncio.wait_for(follow(url), limit)
+    except asyncio.TimeoutError:
+        LATENCY.record_timeout(url)
+        raise FetchError(f'Timed out after {limit:g}s') from None
+
+
+class AsyncNotFoundPages(NotFoundPages):
+    # NotFoundPages for the event loop: the probe is a non-blocking fetch
+    # and only its fingerprint is computed in the executor, so the cache
+    # lives in the serving process and parse workers never touch the network
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = AsyncResultCache(soft_ttl=self.cache.soft_ttl, hard_ttl=self.cache.hard_ttl,
+                                      max_entries=self.cache.entries.max_entries)
+
+    async def get(self, url, timeout=10, executor=None):
+        site = site_of(url)
+        if self.failed_recently(site):
+            return None
+        try:
+            return await self.cache.get(site, lambda: self.probe(site, timeout, executor))
+        except Exception:
+            self.record_failure(site)
+            return None
+
+    async def probe(self, site, timeout, executor):
+        target = not_found_url(site)
+        with self.breaker.attempt(site):
+            final_url, status, _, body = await fetch_async(target, timeout=timeout)
+        if final_url != target or not 200 <= status < 300:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, page_simhash, body)
+
+
+NOT_FOUND = AsyncNotFoundPages()
+
+
+def extract_page(url, final_url, status, headers, body, known=None):
+    # check_content() and extract_pricing() in one call for the executor;
+    # `known` is the host's not-found fingerprint, looked up beforehand
+    check_content(status, final_url, body, lambda: known)
+    return extract_pricing(url, body, headers)
+
+
+async def extract_async(url, final_url, status, headers, body, timeout=10, executor=None,
+                        not_found=NOT_FOUND):
+    known = None
+    if may_be_soft_404(status, final_url):
+        known = await not_found.get(final_url, timeout=timeout, executor=executor)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, extract_page, url, final_url, status,
+                                      headers, body, known)
+
+
+async def scrape_url_async(url, timeout=10, executor=None):
+    # Parsing is CPU-bound and runs in `executor` (a process pool in the
+    # server) so the event loop only ever waits on sockets
+    url = normalize_url(url)
+    try:
+        with BREAKER.attempt(url):
+            final_url, status, headers, body = await fetch_async(url, timeout=timeout)
+            check_response(status, headers, body)
+        return await extract_async(url, final_url, status, headers, body, timeout=timeout,
+                                   executor=executor)
+    except Exception as e:
+        return empty_result(url, error=str(e) or type(e).__name__)
+
+
+async def scrape_many_async(urls, concurrency=100, timeout=10, executor=None):
+    # Every host is resolved up front on the bounded resolver pool; hosts
+    # that do not resolve fail without taking a fetch slot
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def scrape(url):
+        host = hostname_of(url)
+        if host:
+            try:
+                await asyncio.wrap_future(DNS.submit(host))
+            except RESOLVE_ERRORS as e:
+                return empty_result(normalize_url(url), error=dns_error(url, e))
+        async with semaphore:
+            return await scrape_url_async(url, timeout=timeout, executor=executor)
+
+    return await asyncio.gather(*(scrape(url) for url in urls))
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from .aio import (FetchError, extract_async, fetch_async, read_chunked, read_headers,
+                  scrape_many_async)
+from .breaker import BREAKER
+from .cache import AsyncResultCache
+from .challenge import check_response
+from .normalize import canonicalize
+from .results import save_results
+from .uploads import UPLOAD_TYPES, index_from_request
+from .web import (ROOT, cacheable_json_response, cacheable_result, get_query, load_handler,
+                  load_routes)
+
+MAX_REQUEST_BODY = 17 * 1024 * 1024
+KEEPALIVE_TIMEOUT = 65
+STREAM_QUEUE_SIZE = 8
+END = object()
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(status, payload):
+    return {'statusCode': status, 'headers': dict(JSON_HEADERS), 'body': json.dumps(payload)}
+
+
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise BadRequest(400, 'Malformed request line') from None
+    headers = await read_headers(reader)
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        try:
+            body = await read_chunked(reader, MAX_REQUEST_BODY)
+        except FetchError:
+            raise BadRequest(413, 'Request body too large') from None
+    else:
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise BadRequest(400, 'Invalid Content-Length') from None
+        if length < 0:
+            raise BadRequest(400, 'Invalid Content-Length')
+        if length > MAX_REQUEST_BODY:
+            raise BadRequest(413, 'Request body too large')
+        body = await reader.readexactly(length) if length else b''
+
+    content_type = headers.get('content-type', '').lower()
+    if not content_type.startswith(UPLOAD_TYPES):
+        body = body.decode('utf-8', errors='replace') or '{}'
+    return {
+        'method': method.upper(),
+        'path': target,
+        'version': version,
+        'headers': headers,
+        'query': dict(parse_qsl(urlsplit(target).query)),
+        'body': body
+    }
+
+
+def keep_alive(request):
+    connection = request['headers'].get('connection', '').lower()
+    if request['version'] == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
+
+
+async def write_response(writer, response, keep):
+    status = response.get('statusCode', 200)
+    headers = dict(response.get('headers') or {})
+    body = response.get('body', '')
+    streamed = not isinstance(body, (str, bytes))
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    headers['Connection'] = 'keep-alive' if keep else 'close'
+    if streamed:
+        headers['Transfer-Encoding'] = 'chunked'
+    else:
+        headers['Content-Length'] = str(len(body))
+    lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+    if not streamed:
+        writer.write(body)
+        await writer.drain()
+        return
+    async for chunk in body:
+        if chunk:
+            writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            await writer.drain()
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+class Server:
+    # Serves the routes in vercel.json from one event loop. The scraping
+    # endpoints fetch with non-blocking sockets and parse in a process pool;
+    # all other handlers run unchanged in a thread pool.
+
+    def __init__(self, root=ROOT, parse_workers=None, handler_threads=32, concurrency=200,
+                 timeout=10, bulk_limit=1000):
+        self.root = root
+        self.parse_pool = ProcessPoolExecutor(parse_workers)
+        self.thread_pool = ThreadPoolExecutor(handler_threads)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.bulk_limit = bulk_limit
+        self.cache = AsyncResultCache()
+        self.handlers = {}
+        self.static = {}
+        for src, dest in load_routes(root):
+            if dest.endswith('.py'):
+                self.handlers[src] = load_handler(dest, root)
+            else:
+                self.static[src] = os.path.join(root, dest.lstrip('/'))
+        # Endpoints with a native async implementation, per method
+        self.native = {
+            ('/api/scrape_single', 'GET'): self.scrape_single,
+            ('/api/scrape_single', 'POST'): self.scrape_single,
+            ('/api/scrape_bulk', 'POST'): self.scrape_bulk
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEPALIVE_TIMEOUT)
+                except BadRequest as e:
+                    await write_response(writer, json_response(e.status, {'error': str(e)}), False)
+                    return
+                if request is None:
+                    return
+                keep = keep_alive(request)
+                response = await self.dispatch(request)
+                await write_response(writer, response, keep)
+                if not keep:
+                    return
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        path = urlsplit(request['path']).path
+        if path in self.static:
+            return await self.serve_static(self.static[path])
+        handler = self.handlers.get(path)
+        if handler is None:
+            return json_response(404, {'error': 'Not found'})
+        native = self.native.get((path, request['method']))
+        if native is not None:
+            try:
+                return await native(request)
+            except Exception as e:
+                return json_response(500, {'error': str(e)})
+        return await self.call_sync(handler, request)
+
+    async def serve_static(self, path):
+        loop = asyncio.get_running_loop()
+        with open(path, 'rb') as f:
+            body = await loop.run_in_executor(self.thread_pool, f.read)
+        return {'statusCode': 200, 'headers': {'Content-Type': 'text/html; charset=utf-8'},
+                'body': body}
+
+    async def call_sync(self, handler, request):
+        # The handler and any iterator body it returns are run on the same
+        # pool thread; chunks come back through a small bounded queue so a
+        # slow client never makes the export buffer in memory
+        loop = asyncio.get_running_loop()
+        head = loop.create_future()
+        queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+        cancelled = threading.Event()
+
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def run():
+            try:
+                response = handler(request, None)
+            except Exception as e:
+                loop.call_soon_threadsafe(head.set_exception, e)
+                return
+            body = response.get('body', '')
+            if isinstance(body, (str, bytes)):
+                loop.call_soon_threadsafe(head.set_result, response)
+                return
+            loop.call_soon_threadsafe(head.set_result, dict(response, body=stream()))
+            try:
+                for chunk in body:
+                    if cancelled.is_set():
+                        return
+                    put(chunk)
+                put(END)
+            except Exception as e:
+                put(e)
+
+        async def stream():
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is END:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                cancelled.set()
+                while not queue.empty():
+                    queue.get_nowait()
+
+        self.thread_pool.submit(run)
+        return await head
+
+    async def save(self, results, batch):
+        loop = asyncio.get_running_loop()
+        saved = await loop.run_in_executor(self.thread_pool, save_results, results, batch)
+        return batch if saved else None
+
+    async def scrape(self, url):
+        with BREAKER.attempt(url):
+            final_url, status, headers, content = await fetch_async(url, timeout=self.timeout)
+            check_response(status, headers, content)
+        pricing_data = await extract_async(url, final_url, status, headers, content,
+                                           timeout=self.timeout, executor=self.parse_pool)
+        batch = await self.save([pricing_data], uuid.uuid4().hex)
+        return pricing_data, batch
+
+    async def scrape_single(self, request):
+        if request['method'] == 'GET':
+            data = get_query(request)
+        else:
+            body = request['body']
+            data = json.loads(body) if isinstance(body, str) else {}
+        url = data.get('url', '').strip()
+        if not url:
+            return json_response(400, {'error': 'Please provide a url'})
+        # www. is kept: some sites only answer on one of the two hosts
+        url = canonicalize(url, strip_www=False)
+        if url is None:
+            return json_response(400, {'error': 'Invalid url'})
+
+        try:
+            pricing_data, batch = await self.cache.get(url, lambda: self.scrape(url))
+        except Exception as e:
+            return json_response(500, {'success': False, 'error': str(e)})
+
+        if request['method'] == 'GET':
+            return cacheable_json_response(request, cacheable_result(pricing_data))
+        return json_response(200, {'success': True, 'data': pricing_data, 'error': None,
+                                   'batch': batch})
+
+    async def scrape_bulk(self, request):
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(self.thread_pool, index_from_request, request)
+        if not index.total:
+            return json_response(400, {'error': 'No domains provided'})
+
+        # Domains past the per-request limit are returned as pending for a
+        # follow-up call, as /api/scrape_bulk does with its time budget
+        unique_urls = list(index.urls())[:self.bulk_limit]
+        scraped = await scrape_many_async(unique_urls, concurrency=self.concurrency,
+                                          timeout=self.timeout, executor=self.parse_pool)
+        finished = set()
+        results = []
+        for result in scraped:
+            finished.add(result['url'])
+            results.extend(index.expand(result))
+        results.extend(index.invalid_results())
+        pending = [rows[0][1] for url, rows in index.rows.items() if url not in finished]
+
+        batch = await self.save(results, uuid.uuid4().hex)
+        return json_response(200, {'message': f'Scraped {len(results)} urls, '
+                                              f'{len(pending)} pending',
+                                   'results': results, 'total': len(results),
+                                   'pending': pending, 'batch': batch})
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port,
+                                            limit=256 * 1024, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scraper.aioserver',
+                                     description='Serve the api/ endpoints from one asyncio process.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--parse-workers', type=int, help='processes for HTML parsing '
+                        '(default: one per CPU)')
+    parser.add_argument('--threads', type=int, default=32,
+                        help='threads for the non-scraping handlers (default 32)')
+    parser.add_argument('--concurrency', type=int, default=200,
+                        help='concurrent fetches per bulk request (default 200)')
+    parser.add_argument('--bulk-limit', type=int, default=1000,
+                        help='maximum unique domains per bulk request (default 1000)')
+    parser.add_argument('-t', '--timeout', type=float, default=10)
+    args = parser.parse_args(argv)
+
+    server = Server(parse_workers=args.parse_workers, handler_threads=args.threads,
+                    concurrency=args.concurrency, timeout=args.timeout,
+                    bulk_limit=args.bulk_limit)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
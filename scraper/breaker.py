@@ -0,0 +1,183 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from .cache import MAX_TRACKED, LRUDict
+
+DNS = 'dns'
+REFUSED = 'refused'
+TLS = 'tls'
+TIMEOUT = 'timeout'
+BLOCKED = 'blocked'
+CHALLENGED = 'challenged'
+
+# Responses that refuse the scraper outright rather than serve a page
+BLOCK_STATUSES = (403, 429, 503)
+
+# Consecutive failures of a kind before the circuit opens, and the first
+# backoff in seconds; each further failure doubles it up to MAX_BACKOFF
+THRESHOLDS = {DNS: 1, REFUSED: 1, TLS: 1, TIMEOUT: 2, BLOCKED: 1, CHALLENGED: 1}
+BACKOFF = {DNS: 900, REFUSED: 120, TLS: 600, TIMEOUT: 60, BLOCKED: 300, CHALLENGED: 1800}
+MAX_BACKOFF = 6 * 3600
+# An expired circuit lets one request through; others keep failing fast
+# for this long while it runs
+PROBE_WINDOW = 30
+
+MESSAGES = [
+    (DNS, ('Name or service not known', 'nodename nor servname', 'getaddrinfo failed',
+           'Failed to resolve', 'No address associated')),
+    (REFUSED, ('Connection refused',)),
+    (TLS, ('CERTIFICATE_VERIFY_FAILED', 'SSL:', 'certificate')),
+    (TIMEOUT, ('timed out', 'Timed out')),
+]
+
+# Parts of an error message that differ between repeats of one failure:
+# object addresses and an open circuit's countdown (see HostBreaker.check)
+VOLATILE_RE = re.compile(r' at 0x[0-9a-fA-F]+| \(skipped: \S+ is failing, retry in \d+s\)$')
+
+
+class Blocked(Exception):
+    pass
+
+
+class Challenged(Exception):
+    # A bot wall's challenge page came back instead of the site (see
+    # challenge.py)
+    pass
+
+
+class HostUnavailable(Exception):
+    pass
+
+
+def check_status(status):
+    if status in BLOCK_STATUSES:
+        raise Blocked(f'HTTP {status}')
+
+
+def iter_chain(error):
+    # requests wraps the socket error several layers deep (ConnectionError ->
+    # MaxRetryError.reason -> NewConnectionError -> gaierror)
+    seen = set()
+    stack = [error]
+    while stack:
+        e = stack.pop()
+        # ssl.SSLError.reason is a string, not an exception
+        if not isinstance(e, BaseException) or id(e) in seen:
+            continue
+        seen.add(id(e))
+        yield e
+        context = None if e.__suppress_context__ else e.__context__
+        stack += [e.__cause__, context, getattr(e, 'reason', None)]
+        stack += [arg for arg in e.args if isinstance(arg, BaseException)]
+
+
+def classify(error):
+    # Returns the kind of host failure, or None for errors that say nothing
+    # about the host (bad input, parse errors)
+    chain = list(iter_chain(error))
+    for e in chain:
+        name = type(e).__name__
+        if isinstance(e, Challenged):
+            return CHALLENGED
+        if isinstance(e, Blocked):
+            return BLOCKED
+        if name == 'gaierror':
+            return DNS
+        if isinstance(e, ConnectionRefusedError):
+            return REFUSED
+        if 'SSL' in name or 'Certificate' in name:
+            return TLS
+        if 'timeout' in name.lower():
+            return TIMEOUT
+    for e in chain:
+        message = str(e)
+        for kind, needles in MESSAGES:
+            if any(needle in message for needle in needles):
+                return kind
+    return None
+
+
+def error_kind(message):
+    # Stable key of a stored error message, for telling a new failure from
+    # the same one again: the failure kind when the message names one, else
+    # the message without its volatile parts
+    if not message:
+        return None
+    message = VOLATILE_RE.sub('', message)
+    for kind, needles in MESSAGES:
+        if any(needle in message for needle in needles):
+            return kind
+    return message
+
+
+def host_of(url):
+    # Keyed by host and port: one dead service must not block its neighbours
+    return urlsplit(url).netloc.rsplit('@', 1)[-1].lower() or url
+
+
+class HostBreaker:
+    # Per-host circuit breaker. Classified failures open the host's circuit
+    # with exponential backoff; while open, attempts fail at once with the
+    # last error instead of waiting out another timeout. A success closes it.
+
+    def __init__(self, thresholds=THRESHOLDS, backoff=BACKOFF, max_backoff=MAX_BACKOFF,
+                 max_hosts=MAX_TRACKED, clock=time.monotonic):
+        self.thresholds = thresholds
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.hosts = LRUDict(max_hosts)
+        self.lock = threading.Lock()
+
+    def check(self, url):
+        # Returns the cached error while the circuit is open, else None
+        host = host_of(url)
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or state['open_until'] is None:
+                return None
+            now = self.clock()
+            if now >= state['open_until']:
+                state['open_until'] = now + PROBE_WINDOW
+                return None
+            wait = state['open_until'] - now
+            return f'{state["error"]} (skipped: {host} is failing, retry in {wait:.0f}s)'
+
+    def failure(self, url, error):
+        kind = classify(error)
+        if kind is None:
+            return None
+        host = host_of(url)
+        with self.lock:
+            state = self.hosts.touch(host)
+            if state is None or state['kind'] != kind:
+                state = self.hosts[host] = {'kind': kind, 'failures': 0, 'open_until': None}
+            state['failures'] += 1
+            state['error'] = str(error) or type(error).__name__
+            over = state['failures'] - self.thresholds[kind]
+            if over >= 0:
+                delay = min(self.backoff[kind] * 2 ** over, self.max_backoff)
+                state['open_until'] = self.clock() + delay
+        return kind
+
+    def success(self, url):
+        with self.lock:
+            self.hosts.pop(host_of(url), None)
+
+    @contextmanager
+    def attempt(self, url):
+        error = self.check(url)
+        if error is not None:
+            raise HostUnavailable(error)
+        try:
+            yield
+        except Exception as e:
+            self.failure(url, e)
+            raise
+        self.success(url)
+
+
+BREAKER = HostBreaker()
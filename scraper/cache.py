@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Results younger than SOFT_TTL seconds are served as is. Between SOFT_TTL
+# and HARD_TTL the stale result is served immediately and one background
+# refresh is started; past HARD_TTL callers wait for a fresh scrape.
+SOFT_TTL = float(os.environ.get('SCRAPE_CACHE_SOFT_TTL', 300))
+HARD_TTL = float(os.environ.get('SCRAPE_CACHE_HARD_TTL', 3600))
+MAX_ENTRIES = int(os.environ.get('SCRAPE_CACHE_MAX_ENTRIES', 4096))
+# Bound on the per-host and per-url state of the breaker, latency tracker,
+# resolver, redirect cache and not-found probes
+MAX_TRACKED = int(os.environ.get('SCRAPE_MAX_TRACKED', 100000))
+REFRESH_WORKERS = 4
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+
+class LRUDict(OrderedDict):
+    # OrderedDict that keeps the max_entries keys most recently stored or
+    # touched, dropping the least recent. No lock of its own: owners guard it
+    # together with the rest of their state.
+
+    def __init__(self, max_entries=MAX_TRACKED):
+        super().__init__()
+        self.max_entries = max_entries
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+
+    def touch(self, key):
+        # The key's value, marked as most recently used; None if absent
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+
+class ResultCache:
+    # In-process LRU of scrape results. Loads for the same key are coalesced:
+    # concurrent misses wait on one load and a stale key is refreshed at most
+    # once at a time. A failed load is never cached; a failed refresh keeps
+    # the stale value until it passes the hard TTL.
+
+    def __init__(self, soft_ttl=SOFT_TTL, hard_ttl=HARD_TTL, max_entries=MAX_ENTRIES,
+                 clock=time.monotonic):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = max(hard_ttl, soft_ttl)
+        self.clock = clock
+        self.entries = LRUDict(max_entries)
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {FRESH: 0, STALE: 0, MISS: 0}
+        self._pool = None
+
+    def lookup(self, key):
+        entry = self.entries.touch(key)
+        if entry is None:
+            return None, MISS
+        value, stored_at = entry
+        age = self.clock() - stored_at
+        if age >= self.hard_ttl:
+            del self.entries[key]
+            return None, MISS
+        return value, FRESH if age < self.soft_ttl else STALE
+
+    def store(self, key, value):
+        self.entries[key] = (value, self.clock())
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(REFRESH_WORKERS)
+        return self._pool
+
+    def get(self, key, load):
+        with self.lock:
+            value, state = self.lookup(key)
+            self.stats[state] += 1
+            if state == FRESH:
+                return value
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if state == STALE:
+            if owner:
+                self.pool.submit(self.run, key, load, future)
+            return value
+        if owner:
+            self.run(key, load, future)
+        return future.result()
+
+    def run(self, key, load, future):
+        try:
+            value = load()
+        except BaseException as e:
+            with self.lock:
+                self.inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self.lock:
+            self.store(key, value)
+            self.inflight.pop(key, None)
+        future.set_result(value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class AsyncResultCache(ResultCache):
+    # Same policy for the asyncio server: load is a coroutine function and
+    # refreshes run as tasks on the calling loop.
+
+    async def get(self, key, load):
+        import asyncio
+
+        with self.lock:
+            value, state = self.lookup(key)
+            self.stats[state] += 1
+        if state == FRESH:
+            return value
+        task = self.inflight.get(key)
+        if task is None:
+            task = self.inflight[key] = asyncio.ensure_future(self.run(key, load))
+            # A failed background refresh has no one waiting on it
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if state == STALE:
+            return value
+        return await asyncio.shield(task)
+
+    async def run(self, key, load):
+        try:
+            value = await load()
+            with self.lock:
+                self.store(key, value)
+            return value
+        finally:
+            self.inflight.pop(key, None)
@@ -0,0 +1,56 @@
+from .breaker import Challenged, check_status
+
+# Bot walls answer with a challenge page (200, 403 or 503) instead of the
+# site. They are recognised from headers and the start of the body, before
+# anything is parsed; only this many bytes are looked at.
+SCAN_BYTES = 1024
+
+# (vendor, header, substring of its value; '' matches any value)
+HEADER_SIGNATURES = [
+    ('Cloudflare', 'cf-mitigated', 'challenge'),
+    ('AWS WAF', 'x-amzn-waf-action', ''),
+    ('Sucuri', 'x-sucuri-block', ''),
+]
+
+# (vendor, lowercase byte patterns)
+BODY_SIGNATURES = [
+    ('Cloudflare', (b'<title>just a moment...</title>', b'cf-browser-verification',
+                    b'cf_chl_opt', b'attention required! | cloudflare')),
+    ('Akamai', (b'errors.edgesuite.net', b'bm-verify')),
+    ('Imperva', (b'_incapsula_resource', b'incapsula incident id')),
+    ('DataDome', (b'captcha-delivery.com',)),
+    ('PerimeterX', (b'px-captcha', b'<title>access to this page has been denied')),
+    ('Sucuri', (b'sucuri website firewall',)),
+    (None, (b'<title>checking your browser', b'<title>attention required')),
+]
+
+# Patterns that are shared with the vendor's other error pages (Cloudflare's
+# 52x outage pages have cf-error-details too) and only mean a bot wall on a 403
+DENIED_SIGNATURES = [
+    ('Cloudflare', (b'cf-error-details',)),
+]
+
+
+def detect(headers, body, status=None):
+    # Name of the bot wall that served the response ('bot wall' when the
+    # vendor is unknown), or None for an ordinary page. `headers` is a
+    # case-insensitive mapping or a dict with lowercase names.
+    for vendor, name, needle in HEADER_SIGNATURES:
+        value = headers.get(name)
+        if value is not None and needle in value.lower():
+            return vendor
+    head = body[:SCAN_BYTES].lower()
+    signatures = BODY_SIGNATURES + DENIED_SIGNATURES if status == 403 else BODY_SIGNATURES
+    for vendor, needles in signatures:
+        if any(needle in head for needle in needles):
+            return vendor or 'bot wall'
+    return None
+
+
+def check_response(status, headers, body):
+    # check_status() that first turns challenge pages into Challenged, so
+    # the host is held back long enough for the wall to matter
+    vendor = detect(headers, body, status)
+    if vendor is not None:
+        raise Challenged(f'Bot challenge from {vendor} (HTTP {status})')
+    check_status(status)
@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import sys
+
+from .aimd import ConcurrencyLimiter
+from .engine import scrape_by_host, shared_scrape
+from .inputs import read_rows
+from .jobs import DONE, FAILED, IN_FLIGHT, PENDING, JobStore
+from .normalize import DomainIndex
+from .monitor import Monitor
+from .outputs import DIFF_WRITERS, WRITERS, open_output
+from .progress import Progress
+from .redirects import REDIRECTS
+from .results import ResultStore
+from .scheduler import HOUR, Scheduler
+from .worker import run_fleet
+
+STORE_BATCH = 500
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m scraper',
+        description='Scrape pricing plans for a list of domains.'
+    )
+    parser.add_argument('input', help='domain file (csv, txt or .gz); "-" reads stdin')
+    parser.add_argument('-o', '--output', default='-', help='output file; "-" writes stdout')
+    parser.add_argument('-f', '--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('-c', '--concurrency', type=int, default=16,
+                        help='concurrent fetches to start with (default 16)')
+    parser.add_argument('--max-concurrency', type=int, default=64,
+                        help='upper bound for the adaptive concurrency (default 64)')
+    parser.add_argument('--fixed-concurrency', action='store_true',
+                        help='always run exactly --concurrency fetches at a time')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='write concurrency metrics (limits over time) as JSON to FILE')
+    parser.add_argument('-t', '--timeout', type=float, default=10)
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress output')
+    parser.add_argument('--keep-www', action='store_true',
+                        help='treat www.example.com and example.com as different domains')
+    parser.add_argument('--keep-trailing-slash', action='store_true',
+                        help='treat example.com/pricing/ and example.com/pricing as different urls')
+    parser.add_argument('--job-db', help='SQLite checkpoint database; makes the run resumable')
+    parser.add_argument('--job', help='job id inside --job-db (default: input file name)')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='when resuming, re-queue domains that failed previously')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='with --job-db: scrape in up to this many worker processes, scaled '
+                             'with the queue depth; several hosts may share one --job-db')
+    parser.add_argument('--urls-per-worker', type=int, default=500,
+                        help='queue depth per worker process when scaling (default 500)')
+    parser.add_argument('--redirects', metavar='DB',
+                        help='SQLite cache of where each url redirects; later runs with the '
+                             'same file fetch the final urls directly')
+    parser.add_argument('--store', metavar='DB',
+                        help='also save every result in this SQLite result store')
+    parser.add_argument('--monitor', action='store_true',
+                        help='only re-extract pages whose content changed since the last run '
+                             'in --store, and write the changes instead of the results')
+    parser.add_argument('--schedule', action='store_true',
+                        help='monitor continuously: revisit each url when it is due, sooner for '
+                             'pages whose prices change often (implies --monitor)')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='scheduler: maximum fetches per second (default 2)')
+    parser.add_argument('--interval', type=float, default=24,
+                        help='scheduler: initial revisit interval in hours (default 24)')
+    parser.add_argument('--min-interval', type=float, default=1,
+                        help='scheduler: shortest revisit interval in hours (default 1)')
+    parser.add_argument('--max-interval', type=float, default=720,
+                        help='scheduler: longest revisit interval in hours (default 720)')
+    parser.add_argument('--duration', type=float,
+                        help='scheduler: stop after this many hours (default: run forever)')
+    return parser
+
+
+class StoreSink:
+    # Buffers results for the result store and writes them in batches
+
+    def __init__(self, path, batch):
+        self.store = ResultStore(path) if path else None
+        self.batch = batch
+        self.buffer = []
+
+    def add(self, result):
+        if self.store:
+            self.buffer.append(result)
+            if len(self.buffer) >= STORE_BATCH:
+                self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.store.add_many(self.buffer, batch=self.batch)
+            self.buffer = []
+
+    def close(self):
+        if self.store:
+            self.flush()
+            self.store.close()
+
+
+def build_index(args):
+    # Canonicalise and deduplicate the whole input before any network work
+    index = DomainIndex(strip_www=not args.keep_www,
+                        strip_trailing_slash=not args.keep_trailing_slash)
+    index.add_all(read_rows(args.input))
+    if not args.quiet:
+        sys.stderr.write(f'{index.total} input rows, {len(index.rows)} unique, '
+                         f'{index.duplicates} duplicates, {len(index.invalid)} invalid\n')
+    return index
+
+
+def build_limiter(args):
+    if args.fixed_concurrency:
+        return None
+    return ConcurrencyLimiter(args.concurrency, max(args.concurrency, args.max_concurrency))
+
+
+def write_metrics(args, limiter):
+    if args.metrics and limiter is not None:
+        with open(args.metrics, 'w') as f:
+            json.dump(limiter.metrics(), f, indent=2)
+
+
+def write_invalid(index, writer):
+    for result in index.invalid_results():
+        writer.write(result)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.monitor or args.schedule) and not args.store:
+        parser.error('--monitor and --schedule require --store')
+    if args.redirects:
+        REDIRECTS.load(args.redirects)
+    try:
+        if args.monitor or args.schedule:
+            if args.schedule:
+                return run_schedule(args)
+            return run_monitor(args)
+        if args.job_db and args.workers:
+            return run_workers(args)
+        if args.job_db:
+            return run_job(args)
+        return run_scrape(args)
+    finally:
+        if args.redirects:
+            REDIRECTS.save(args.redirects)
+
+
+def run_scrape(args):
+    index = build_index(args)
+    limiter = build_limiter(args)
+    progress = None if args.quiet else Progress(total=len(index.rows), limiter=limiter)
+    sink = StoreSink(args.store, batch=os.path.basename(args.input))
+
+    f, writer = open_output(args.output, args.format)
+    try:
+        write_invalid(index, writer)
+        results = scrape_by_host(index.urls(), concurrency=args.concurrency,
+                                 timeout=args.timeout, scrape=shared_scrape(),
+                                 limiter=limiter)
+        for result in results:
+            sink.add(result)
+            for row in index.expand(result):
+                writer.write(row)
+            if progress:
+                progress.update(result)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        sink.close()
+        write_metrics(args, limiter)
+        if progress:
+            progress.finish()
+        if f is not sys.stdout:
+            f.close()
+    return 0
+
+
+def run_job(args):
+    job_id = args.job or os.path.basename(args.input)
+    index = build_index(args)
+    store = JobStore(args.job_db)
+    sink = StoreSink(args.store, batch=job_id)
+    try:
+        # Re-adding the input is idempotent, so a restarted job only picks up
+        # domains that are new or were not finished last time
+        created = store.create_job(job_id, index.urls(), source=args.input)
+        store.resume(job_id, retry_failed=args.retry_failed)
+
+        counts = store.counts(job_id)
+        remaining = counts[PENDING] + counts[IN_FLIGHT]
+        if not args.quiet:
+            sys.stderr.write(f'job {job_id}: {counts[DONE]} done, {counts[FAILED]} failed, '
+                             f'{remaining} remaining\n')
+        limiter = build_limiter(args)
+        progress = None if args.quiet else Progress(total=remaining, limiter=limiter)
+
+        # Append to the previous output when resuming
+        f, writer = open_output(args.output, args.format, append=True)
+        try:
+            if created:
+                # Invalid inputs never enter the job; a resumed run already
+                # wrote them
+                write_invalid(index, writer)
+            results = scrape_by_host(store.iter_pending(job_id),
+                                     concurrency=args.concurrency, timeout=args.timeout,
+                                     scrape=shared_scrape(), limiter=limiter,
+                                     ordered=False)
+            for result in results:
+                store.record(job_id, result['url'], result)
+                sink.add(result)
+                for row in index.expand(result):
+                    writer.write(row)
+                if progress:
+                    progress.update(result)
+        except KeyboardInterrupt:
+            return 130
+        finally:
+            write_metrics(args, limiter)
+            if progress:
+                progress.finish()
+            if f is not sys.stdout:
+                f.close()
+    finally:
+        sink.close()
+        store.close()
+    return 0
+
+
+def run_monitor(args):
+    index = build_index(args)
+    limiter = build_limiter(args)
+    progress = None if args.quiet else Progress(total=len(index.rows), limiter=limiter)
+    store = ResultStore(args.store)
+    monitor = Monitor(store)
+    changed = 0
+
+    f, writer = open_output(args.output, args.format, writers=DIFF_WRITERS)
+    try:
+        results = scrape_by_host(index.urls(), concurrency=args.concurrency,
+                                 timeout=args.timeout, scrape=monitor.scrape,
+                                 limiter=limiter)
+        for result in results:
+            result, change = monitor.record(result)
+            if change:
+                changed += 1
+                writer.write(change)
+            if progress:
+                progress.update(result)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        store.close()
+        write_metrics(args, limiter)
+        if progress:
+            progress.finish()
+            sys.stderr.write(f'{changed} changed\n')
+        if f is not sys.stdout:
+            f.close()
+    return 0
+
+
+def run_schedule(args):
+    index = build_index(args)
+    store = ResultStore(args.store)
+    monitor = Monitor(store)
+    scheduler = Scheduler(store.conn, rate=args.rate, interval=args.interval * HOUR,
+                          min_interval=args.min_interval * HOUR,
+                          max_interval=args.max_interval * HOUR)
+    scheduler.add_all(index.urls())
+    progress = None if args.quiet else Progress()
+    if not args.quiet:
+        sys.stderr.write(f'scheduling {len(scheduler)} urls at up to {args.rate:g}/s\n')
+
+    f, writer = open_output(args.output, args.format, append=True, writers=DIFF_WRITERS)
+
+    def on_result(result):
+        result, change = monitor.record(result)
+        if change:
+            writer.write(change)
+        if progress:
+            progress.update(result)
+        return change is not None and change['status'] == 'changed'
+
+    try:
+        scheduler.run(monitor.scrape, on_result, concurrency=args.concurrency,
+                      timeout=args.timeout,
+                      duration=args.duration * HOUR if args.duration else None)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        scheduler.close()
+        store.close()
+        if progress:
+            progress.finish()
+        if f is not sys.stdout:
+            f.close()
+    return 0
+
+
+def run_workers(args):
+    job_id = args.job or os.path.basename(args.input)
+    index = build_index(args)
+    store = JobStore(args.job_db)
+    try:
+        store.create_job(job_id, index.urls(), source=args.input)
+        counts = store.counts(job_id)
+    finally:
+        store.close()
+
+    remaining = counts[PENDING] + counts[IN_FLIGHT]
+    progress = None
+    if not args.quiet:
+        sys.stderr.write(f'job {job_id}: {counts[DONE]} done, {counts[FAILED]} failed, '
+                         f'{remaining} remaining\n')
+        progress = Progress(total=counts[DONE] + counts[FAILED] + remaining)
+
+    def on_poll(counts, workers):
+        if progress:
+            progress.set(counts[DONE] + counts[FAILED], counts[FAILED])
+
+    try:
+        run_fleet(args.job_db, job_id, max_workers=args.workers,
+                  urls_per_worker=args.urls_per_worker, concurrency=args.concurrency,
+                  timeout=args.timeout, on_poll=on_poll)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if progress:
+            progress.finish()
+
+    # Worker processes only write to the job database; the output file is
+    # produced from it once the job is complete
+    store = JobStore(args.job_db)
+    sink = StoreSink(args.store, batch=job_id)
+    f, writer = open_output(args.output, args.format)
+    try:
+        write_invalid(index, writer)
+        for result in store.iter_results(job_id):
+            sink.add(result)
+            for row in index.expand(result):
+                writer.write(row)
+    finally:
+        sink.close()
+        store.close()
+        if f is not sys.stdout:
+            f.close()
+    return 0
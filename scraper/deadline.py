@@ -0,0 +1,33 @@
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    # A point in time shared by every stage of one invocation. Each stage
+    # asks for a timeout that fits in what is left instead of using its own
+    # fixed one, and checks before starting work it could not finish.
+
+    def __init__(self, seconds, clock=time.monotonic):
+        self.clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - self.clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, minimum=0.0):
+        # Raises when less than `minimum` seconds are left, so work that
+        # cannot finish is never started
+        remaining = self.remaining()
+        if remaining <= 0 or remaining < minimum:
+            raise DeadlineExceeded('Out of time')
+
+    def timeout(self, cap):
+        # `cap` shrunk to the time left
+        self.check()
+        return min(cap, self.remaining())
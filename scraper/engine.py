@@ -0,0 +1,304 @@
+import queue
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import islice
+
+from .breaker import BREAKER, host_of
+from .cache import ResultCache
+from .challenge import check_response
+from .deadline import DeadlineExceeded
+from .extract import empty_result, extract_pricing
+from .fetch import fetch, normalize_url
+from .fingerprints import check_page
+from .redirects import REDIRECTS
+from .resolve import dns_error, resolve_ahead
+
+
+# Work is only started with at least this many seconds left on the deadline
+MIN_START = 1.0
+# scrape_by_host: urls grouped per window, and connections per host
+HOST_WINDOW = 500
+HOST_LANES = 2
+# Extractions kept per bulk job for inputs that land on the same final url
+SHARED_RESULTS = 10000
+
+
+def fetch_page(url, timeout=10, deadline=None):
+    # fetch() behind the host's breaker; raises for blocked statuses and
+    # challenge pages, and
+    # DeadlineExceeded when it was the deadline that cut the fetch short
+    with BREAKER.attempt(url):
+        try:
+            response = fetch(url, timeout=timeout, deadline=deadline)
+        except Exception:
+            if deadline is not None and deadline.remaining() < MIN_START:
+                raise DeadlineExceeded('Out of time') from None
+            raise
+        check_response(response.status_code, response.headers, response.content)
+    return response
+
+
+def fetch_final(url, timeout=10, deadline=None, redirects=REDIRECTS):
+    # fetch_page() that goes straight to where the url was redirected last
+    # time, follows the whole chain again if that fails, and remembers
+    # where the chain ends
+    target = redirects.lookup(url)
+    if target is not None:
+        try:
+            response = fetch_page(target, timeout=timeout, deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            redirects.forget(url)
+        else:
+            redirects.store(url, response)
+            return response
+    response = fetch_page(url, timeout=timeout, deadline=deadline)
+    redirects.store(url, response)
+    return response
+
+
+def scrape_url(url, timeout=10, deadline=None, shared=None):
+    # With a deadline the fetch timeout shrinks to the time left, and a page
+    # that arrives too late is not parsed. Running out of time raises
+    # DeadlineExceeded rather than being reported (or held against the host)
+    # as a failure.
+    # With `shared` (see shared_scrape) urls that end up on the same final
+    # url share one extraction, and one fetch too once the redirect is known.
+    url = normalize_url(url)
+
+    def extract(response, final_url):
+        if deadline is not None:
+            deadline.check()
+        check_page(response, timeout=timeout, deadline=deadline)
+        return extract_pricing(final_url, response.content, response.headers)
+
+    try:
+        if deadline is not None:
+            deadline.check(MIN_START)
+        kwargs = {'timeout': timeout, 'deadline': deadline}
+        if shared is None:
+            return extract(fetch_final(url, **kwargs), url)
+        target = REDIRECTS.lookup(url)
+        if target is not None:
+            result = shared.get(target, lambda: extract(fetch_final(url, **kwargs), target))
+        else:
+            response = fetch_final(url, **kwargs)
+            result = shared.get(response.url, lambda: extract(response, response.url))
+        return dict(result, url=url, features=list(result['features']))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        return empty_result(url, error=str(e))
+
+
+def shared_scrape():
+    # scrape_url for one bulk job, sharing results between its urls
+    shared = ResultCache(soft_ttl=float('inf'), hard_ttl=float('inf'),
+                         max_entries=SHARED_RESULTS)
+    return partial(scrape_url, shared=shared)
+
+
+def scrape_many(urls, concurrency=8, timeout=10, scrape=scrape_url, deadline=None,
+                limiter=None):
+    # Results are yielded in completion order. Input is consumed lazily so
+    # that at most 2 * concurrency urls are held in memory at any time, plus
+    # a window of DNS lookups running ahead; hosts that do not resolve fail
+    # without taking a worker.
+    # With a deadline no url is started once less than MIN_START seconds are
+    # left and urls that run out of time are not yielded; callers treat
+    # every url without a result as unfinished.
+    # With a ConcurrencyLimiter the number of urls in flight, overall and per
+    # host, follows the limiter instead of `concurrency`; urls whose host is
+    # at its limit wait while others go ahead.
+    urls = resolve_ahead(urls, window=concurrency * 4, deadline=deadline)
+    kwargs = {} if deadline is None else {'deadline': deadline}
+    max_pending = concurrency * 2
+    workers = concurrency if limiter is None else limiter.maximum
+    deferred = deque()
+
+    def has_room():
+        return len(pending) < max_pending if limiter is None else limiter.has_room()
+
+    def acquire(url):
+        return limiter is None or limiter.acquire(url)
+
+    def start(url):
+        pending[pool.submit(scrape, url, timeout, **kwargs)] = (url, time.monotonic())
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        exhausted = False
+        while pending or deferred or not exhausted:
+            if deadline is not None and deadline.remaining() < MIN_START:
+                exhausted = True
+                deferred.clear()
+            while has_room():
+                # Urls held back for a busy host go first
+                ready = next((url for url in deferred if acquire(url)), None)
+                if ready is not None:
+                    deferred.remove(ready)
+                    start(ready)
+                    continue
+                if exhausted or len(deferred) >= max_pending:
+                    break
+                item = next(urls, None)
+                if item is None:
+                    exhausted = True
+                    break
+                url, error = item
+                if error is not None:
+                    yield empty_result(normalize_url(url), error=dns_error(url, error))
+                elif acquire(url):
+                    start(url)
+                else:
+                    deferred.append(url)
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, started = pending.pop(future)
+                try:
+                    result = future.result()
+                except DeadlineExceeded:
+                    if limiter is not None:
+                        limiter.release(url)
+                    continue
+                if limiter is not None:
+                    limiter.release(url, time.monotonic() - started, result.get('error'))
+                yield result
+
+
+def host_lanes(items, lanes_per_host):
+    # Splits (index, url) pairs into lanes of one host each, at most
+    # `lanes_per_host` per host, biggest first so long lanes start early
+    hosts = OrderedDict()
+    for index, url in items:
+        # Grouped by where the url was redirected to last time, if known
+        target = normalize_url(url)
+        target = REDIRECTS.lookup(target) or target
+        hosts.setdefault(host_of(target), []).append((index, url))
+    lanes = []
+    for group in hosts.values():
+        count = min(lanes_per_host, len(group))
+        lanes.extend(group[i::count] for i in range(count))
+    lanes.sort(key=len, reverse=True)
+    return deque(lanes)
+
+
+def scrape_by_host(urls, concurrency=8, timeout=10, scrape=scrape_url, deadline=None,
+                   limiter=None, window=HOST_WINDOW, lanes_per_host=HOST_LANES, ordered=True):
+    # Like scrape_many, but work is grouped by host: the input is read a
+    # window at a time, each host's urls in the window form up to
+    # `lanes_per_host` lanes, and a lane is fetched back to back on one worker
+    # thread, so over that thread's warm pooled connection. Lanes also keep
+    # at most `lanes_per_host` fetches on a host. Each result is handed back
+    # as soon as its url finishes; with `ordered` they are released in input
+    # order, otherwise in completion order.
+    # With a limiter a lane holds one slot for its host while it runs and
+    # hands the rest of its urls back when the limiter shrinks.
+    items = enumerate(resolve_ahead(urls, window=concurrency * 4, deadline=deadline))
+    kwargs = {} if deadline is None else {'deadline': deadline}
+    workers = concurrency if limiter is None else limiter.maximum
+    lanes = deque()
+    # Lanes report ('result', (index, result)) per url, then ('end', rest)
+    # or ('error', exception)
+    reports = queue.Queue()
+    # Finished results by input index until every earlier one is out; None
+    # marks urls that ran out of time
+    buffered = {}
+    ready = deque()
+    next_index = 0
+    read = 0
+    exhausted = False
+    running = 0
+
+    def settle(index, result):
+        nonlocal next_index
+        if ordered:
+            buffered[index] = result
+            while next_index in buffered:
+                result = buffered.pop(next_index)
+                next_index += 1
+                if result is not None:
+                    ready.append(result)
+        else:
+            next_index += 1
+            if result is not None:
+                ready.append(result)
+
+    def run_lane(lane):
+        try:
+            for position, (index, url) in enumerate(lane):
+                if position and limiter is not None and not limiter.acquire(url):
+                    reports.put(('end', lane[position:]))
+                    return
+                started = time.monotonic()
+                try:
+                    result = scrape(url, timeout, **kwargs)
+                except DeadlineExceeded:
+                    result = None
+                if limiter is not None:
+                    if result is None:
+                        limiter.release(url)
+                    else:
+                        limiter.release(url, time.monotonic() - started, result.get('error'))
+                reports.put(('result', (index, result)))
+            reports.put(('end', []))
+        except BaseException as e:
+            reports.put(('error', e))
+
+    def has_room():
+        return running < (concurrency if limiter is None else limiter.limit)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            if deadline is not None and deadline.remaining() < MIN_START:
+                # Nothing new starts; unstarted urls are simply not yielded
+                exhausted = True
+                for lane in lanes:
+                    for index, _ in lane:
+                        settle(index, None)
+                lanes.clear()
+            # Keep at most two windows between the oldest unfinished url and
+            # the newest one read
+            if not lanes and not exhausted and read - next_index < 2 * window:
+                batch = list(islice(items, window))
+                exhausted = len(batch) < window
+                read += len(batch)
+                fetchable = []
+                for index, (url, error) in batch:
+                    if error is not None:
+                        settle(index, empty_result(normalize_url(url),
+                                                   error=dns_error(url, error)))
+                    else:
+                        fetchable.append((index, url))
+                lanes.extend(host_lanes(fetchable, lanes_per_host))
+
+            while lanes and has_room():
+                lane = next((lane for lane in lanes
+                             if limiter is None or limiter.acquire(lane[0][1])), None)
+                if lane is None:
+                    break
+                lanes.remove(lane)
+                pool.submit(run_lane, lane)
+                running += 1
+
+            while ready:
+                yield ready.popleft()
+
+            if not running:
+                if exhausted and not lanes:
+                    return
+                continue
+            kind, value = reports.get()
+            if kind == 'result':
+                settle(*value)
+            elif kind == 'end':
+                running -= 1
+                if value:
+                    lanes.appendleft(value)
+            else:
+                raise value
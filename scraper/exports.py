@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+import zlib
+
+from .outputs import CSV_FIELDS, csv_row
+
+FLUSH_BYTES = 64 * 1024
+
+
+def iter_csv(results):
+    # Rows are encoded into ~64 KB chunks; nothing else is buffered
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_FIELDS)
+    for result in results:
+        writer.writerow(csv_row(result))
+        if buf.tell() >= FLUSH_BYTES:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode('utf-8')
+
+
+def iter_ndjson(results):
+    lines = []
+    size = 0
+    for result in results:
+        line = json.dumps(result) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            size = 0
+    yield ''.join(lines).encode('utf-8')
+
+
+def iter_gzip(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+EXPORTERS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson')
+}
@@ -0,0 +1,111 @@
+import hashlib
+import re
+from datetime import datetime
+
+PRICE_RE = re.compile(r'\$[\d,]+(?:\.\d{2})?')
+PLAN_PATTERNS = ['basic', 'starter', 'pro', 'premium', 'enterprise']
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR'}
+AMOUNT_RE = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+HIDDEN_RE = re.compile(r'<(script|style|noscript|template|svg)\b.*?</\1\s*>', re.S | re.I)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.S)
+TAG_RE = re.compile(r'<[^>]*>')
+VOLATILE_RE = re.compile(
+    r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?'
+    r'|\b\d{1,2}:\d{2}(?::\d{2})?\b'
+    r'|\b[0-9a-f]{16,}\b'
+    r'|\b[A-Za-z0-9_-]{32,}\b'
+)
+
+
+def timestamp():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def empty_result(url, error=None):
+    result = {
+        'url': url,
+        'plan_name': '',
+        'price': '',
+        'billing_period': '',
+        'features': [],
+        'timestamp': timestamp()
+    }
+    if error is not None:
+        result['error'] = error
+    return result
+
+
+def normalize_price(price):
+    # '$1,299.00' -> (1299.0, 'USD'); (None, None) when there is no amount
+    if not price:
+        return None, None
+    match = AMOUNT_RE.search(price)
+    if not match:
+        return None, None
+    currency = None
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in price:
+            currency = code
+            break
+    return float(match.group().replace(',', '')), currency
+
+
+def visible_text(content):
+    # Lowercased visible text with scripts, markup and volatile tokens
+    # (nonces, csrf tokens, timestamps) removed, without parsing the page
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    text = HIDDEN_RE.sub(' ', content)
+    text = COMMENT_RE.sub(' ', text)
+    text = TAG_RE.sub(' ', text)
+    text = VOLATILE_RE.sub(' ', text)
+    return ' '.join(text.split()).lower()
+
+
+def fingerprint(content):
+    # Hash of the visible text, so it only changes when the page a visitor
+    # reads changes. Cheap enough to run on every fetch.
+    text = visible_text(content)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def extract_pricing(url, content, headers=None):
+    # Pages built on a known platform go to its specialised extractor first,
+    # which parses only the pricing cards or reads the page's own data; the
+    # generic scan of the whole text is the fallback
+    from .platforms import EXTRACTORS, detect_platform
+
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    # Extract basic pricing info
+    pricing_data = empty_result(url)
+    pricing_data['content_hash'] = fingerprint(content)
+
+    platform = detect_platform(content, headers)
+    if platform is not None:
+        pricing_data['platform'] = platform
+        plan = EXTRACTORS[platform](content)
+        if plan is not None:
+            pricing_data.update(plan)
+            return pricing_data
+
+    # bs4 costs ~100 ms to import; only pay for it when a page is parsed
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Look for price patterns
+    text = soup.get_text()
+    price_match = PRICE_RE.search(text)
+    if price_match:
+        pricing_data['price'] = price_match.group()
+
+    # Look for plan names
+    for pattern in PLAN_PATTERNS:
+        if re.search(pattern, text, re.IGNORECASE):
+            pricing_data['plan_name'] = pattern.title()
+            break
+
+    return pricing_data
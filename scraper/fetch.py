@@ -0,0 +1,70 @@
+import threading
+import time
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+_local = threading.local()
+
+
+def normalize_url(url):
+    url = url.strip()
+    # Add protocol if missing
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+def get_session():
+    # One pooled session per worker thread; requests.Session is not thread-safe
+    session = getattr(_local, 'session', None)
+    if session is None:
+        # requests pulls in urllib3, charset_normalizer and idna; imported on
+        # the first fetch so handlers that never fetch start faster
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        from .resolve import install_urllib3
+
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        install_urllib3()
+        _local.session = session
+    return session
+
+
+def fetch(url, timeout=10, deadline=None, on_headers=None, cancelled=None):
+    # Connect and read timeouts come from the host's latency history, with
+    # `timeout` as the default for unseen hosts, and never run past the
+    # deadline. on_headers(response) is called before the body is read and
+    # may raise to abandon the fetch. Once the `cancelled` event is set the
+    # fetch's outcome is not recorded: nobody waits for it any more.
+    from .breaker import TIMEOUT, classify
+    from .latency import LATENCY
+
+    connect, read = LATENCY.timeouts(url, timeout)
+    if deadline is not None:
+        connect, read = deadline.timeout(connect), deadline.timeout(read)
+    started = time.monotonic()
+    try:
+        response = get_session().get(url, timeout=(connect, read), stream=True)
+        if on_headers is not None:
+            try:
+                on_headers(response)
+            except Exception:
+                response.close()
+                raise
+        response.content
+    except Exception as e:
+        # A timeout cut short by the deadline says nothing about the host
+        if (classify(e) == TIMEOUT and (deadline is None or not deadline.expired())
+                and (cancelled is None or not cancelled.is_set())):
+            LATENCY.record_timeout(url)
+        raise
+    if cancelled is None or not cancelled.is_set():
+        LATENCY.record(url, response.elapsed.total_seconds(), time.monotonic() - started)
+    return response
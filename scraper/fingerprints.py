@@ -0,0 +1,183 @@
+import hashlib
+import os
+import re
+import secrets
+from collections import Counter
+from urllib.parse import urlsplit
+
+from .breaker import BREAKER
+from .cache import MAX_TRACKED, MISS, ResultCache
+from .deadline import DeadlineExceeded
+from .extract import visible_text
+
+# SimHash of a page's visible words: pages built from the same template
+# differ in only a few of the 64 bits, unrelated pages in about half
+BITS = 64
+MAX_DISTANCE = 8
+# Pages with fewer distinct words than this are never judged; past
+# MAX_TOKENS only the most frequent words count, which bounds the cost
+MIN_TOKENS = 12
+MAX_TOKENS = 2000
+# Each host's not-found page is probed at most once per NOT_FOUND_TTL seconds
+NOT_FOUND_TTL = float(os.environ.get('SCRAPE_NOT_FOUND_TTL', 86400))
+# ... and a host whose probe failed is retried after NOT_FOUND_RETRY seconds
+NOT_FOUND_RETRY = float(os.environ.get('SCRAPE_NOT_FOUND_RETRY', 600))
+# Words of two or more letters; host names and numbers (the parked domain,
+# prices, counters) are left out so they cannot move the fingerprint
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}')
+PUNCTUATION = '.,:;!?()"\''
+
+# Visible text of common domain-parking templates
+PARKING_SAMPLES = [
+    'example.com this domain is parked free courtesy of godaddy.com get this domain '
+    'pending renewal or deletion want to buy this domain our domain buy service can '
+    'help you get it copyright godaddy operating company llc all rights reserved '
+    'privacy policy',
+    'example.com this domain may be for sale buy this domain the owner of example.com '
+    'is offering it for sale for an asking price of usd sedo related searches '
+    'disclaimer domain owner maintain no relationship with third party advertisers',
+    'example.com is for sale buy now make an offer lease to own the domain example.com '
+    'is for sale secure payments fast transfer buyer protection program get this '
+    'domain powered by dan.com',
+    'example.com is available for purchase the domain example.com is for sale '
+    'hugedomains.com buy now for price or pay monthly money back guarantee 30 days '
+    'free domain transfer help and support questions call us',
+    'example.com this domain was recently registered at namecheap please check back '
+    'later this domain is registered at namecheap this domain was recently registered '
+    'at namecheap com the domain owner may be a user of namecheap',
+    'example.com related searches related links business services online web hosting '
+    'privacy policy this webpage was generated by the domain owner using bodis',
+    'example.com is for sale get this domain find your perfect domain name afternic '
+    'the world s premier domain marketplace buy now secure transaction',
+    'example.com the domain name example.com is for sale inquire now this domain is '
+    'listed for sale domain for sale contact the owner make an offer price on request',
+]
+
+
+class NotPricing(Exception):
+    pass
+
+
+def simhash(text):
+    # 64-bit SimHash over word tokens weighted by count, or None for pages
+    # with too little text to compare
+    words = ' '.join(word for word in text.split() if '.' not in word.strip(PUNCTUATION))
+    weights = Counter(TOKEN_RE.findall(words))
+    if len(weights) < MIN_TOKENS:
+        return None
+    if len(weights) > MAX_TOKENS:
+        weights = dict(weights.most_common(MAX_TOKENS))
+    totals = [0] * BITS
+    for token, weight in weights.items():
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=BITS // 8).digest()
+        value = int.from_bytes(digest, 'big')
+        while value:
+            low = value & -value
+            totals[low.bit_length() - 1] += weight
+            value ^= low
+    half = sum(weights.values()) / 2
+    result = 0
+    for bit, total in enumerate(totals):
+        if total > half:
+            result |= 1 << bit
+    return result
+
+
+def distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+PARKING = [simhash(sample) for sample in PARKING_SAMPLES]
+
+
+class NotFoundPages:
+    # Fingerprint of each host's not-found page, learnt by fetching a path
+    # that cannot exist. None for hosts that answer it with a real 404 or a
+    # redirect: their pages need no comparing. A failed probe counts as None
+    # until NOT_FOUND_RETRY has passed.
+
+    def __init__(self, ttl=NOT_FOUND_TTL, retry=NOT_FOUND_RETRY, max_hosts=MAX_TRACKED,
+                 breaker=BREAKER):
+        self.cache = ResultCache(soft_ttl=ttl, hard_ttl=ttl, max_entries=max_hosts)
+        self.failed = ResultCache(soft_ttl=retry, hard_ttl=retry, max_entries=max_hosts)
+        self.breaker = breaker
+
+    def failed_recently(self, site):
+        with self.failed.lock:
+            _, state = self.failed.lookup(site)
+        return state != MISS
+
+    def record_failure(self, site):
+        with self.failed.lock:
+            self.failed.store(site, None)
+
+    def get(self, url, timeout=10, deadline=None):
+        site = site_of(url)
+        if self.failed_recently(site):
+            return None
+        try:
+            return self.cache.get(site, lambda: self.probe(site, timeout, deadline))
+        except DeadlineExceeded:
+            # The caller's budget ran out; the host is not to blame
+            raise
+        except Exception:
+            self.record_failure(site)
+            return None
+
+    def probe(self, site, timeout, deadline):
+        from .fetch import fetch
+
+        with self.breaker.attempt(site):
+            response = fetch(not_found_url(site), timeout=timeout, deadline=deadline)
+        if response.history or not 200 <= response.status_code < 300:
+            return None
+        return page_simhash(response.content)
+
+
+NOT_FOUND = NotFoundPages()
+
+
+def site_of(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+def not_found_url(site):
+    return f'{site}/{secrets.token_hex(12)}'
+
+
+def page_simhash(content):
+    return simhash(visible_text(content))
+
+
+def may_be_soft_404(status, url):
+    # Soft 404s are only possible below the root of a site
+    return status == 200 and bool(urlsplit(url).path.strip('/'))
+
+
+def check_page(response, timeout=10, deadline=None, not_found=NOT_FOUND):
+    # Raises NotPricing for not-found and parked pages, so they are never
+    # handed to extraction. Soft 404s cost one probe per host; a failed
+    # probe skips that check for a while.
+    def known():
+        return not_found.get(response.url, timeout=timeout, deadline=deadline)
+
+    check_content(response.status_code, response.url, response.content, known)
+
+
+def check_content(status, url, content, known):
+    # check_page() on the parts of a response; known() returns the host's
+    # not-found fingerprint (or None) and is only called for pages that may
+    # be soft 404s
+    if status in (404, 410):
+        raise NotPricing(f'HTTP {status}')
+    page = page_simhash(content)
+    if page is None:
+        return
+    if any(distance(page, parked) <= MAX_DISTANCE for parked in PARKING):
+        raise NotPricing('Parked domain')
+    if not may_be_soft_404(status, url):
+        return
+    fingerprint = known()
+    if fingerprint is not None and distance(page, fingerprint) <= MAX_DISTANCE:
+        raise NotPricing("Soft 404: same page as the site's not-found page")
@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .fetch import fetch
+from .latency import LATENCY
+
+# Hedges allowed per fetch, process-wide: 0.05 caps the extra load at 5%.
+# 0 turns hedging off.
+HEDGE_RATIO = float(os.environ.get('SCRAPE_HEDGE_RATIO', 0.05))
+HEDGE_BURST = 10
+HEDGE_WORKERS = 32
+
+
+class Cancelled(Exception):
+    pass
+
+
+class HedgeBudget:
+    # Token bucket: every fetch earns `ratio` of a token and a hedge costs
+    # one, so hedges stay a fixed share of traffic however busy it gets
+
+    def __init__(self, ratio=HEDGE_RATIO, burst=HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.lock = threading.Lock()
+        self.stats = {'fetches': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def earn(self):
+        with self.lock:
+            self.stats['fetches'] += 1
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.stats['hedges'] += 1
+            return True
+
+
+BUDGET = HedgeBudget()
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(HEDGE_WORKERS)
+    return _pool
+
+
+def hedged_fetch(url, timeout=10, deadline=None, budget=BUDGET):
+    # fetch() that sends a second request, on another connection, when the
+    # first has no response headers after the host's p95 time to first
+    # byte. The first response to arrive wins and the other is closed.
+    budget.earn()
+    delay = LATENCY.ttfb_p95(url)
+    if delay is None or not budget.ratio:
+        return fetch(url, timeout=timeout, deadline=deadline)
+
+    done = queue.Queue()
+    cancelled = threading.Event()
+    responses = []
+
+    def run(headers, hedge):
+        def on_headers(response):
+            headers.set()
+            responses.append(response)
+            if cancelled.is_set():
+                raise Cancelled()
+
+        try:
+            done.put((fetch(url, timeout=timeout, deadline=deadline, on_headers=on_headers,
+                            cancelled=cancelled), None, hedge))
+        except Exception as e:
+            done.put((None, e, hedge))
+        finally:
+            # A fast failure wakes the waiter too, instead of it sitting out
+            # the hedge delay
+            headers.set()
+
+    # Each attempt runs on its own pool thread and so its own session and
+    # connection
+    first_headers = threading.Event()
+    get_pool().submit(run, first_headers, False)
+    attempts = 1
+    if not first_headers.wait(delay) and done.empty() and budget.spend():
+        get_pool().submit(run, threading.Event(), True)
+        attempts = 2
+
+    error = None
+    for _ in range(attempts):
+        response, e, hedge = done.get()
+        if response is not None:
+            cancelled.set()
+            for other in list(responses):
+                if other is not response:
+                    other.close()
+            if hedge:
+                with budget.lock:
+                    budget.stats['hedge_wins'] += 1
+            return response
+        error = e
+    raise error
@@ -0,0 +1,109 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from .web import ROOT
+
+# Modules a cold start should only pay for on paths that fetch or parse
+HEAVY_MODULES = ['requests', 'bs4', 'urllib3', 'charset_normalizer', 'idna', 'certifi',
+                 'soupsieve', 'sqlite3']
+
+PROBE_IMPORTS = 'import importlib.util, json, sys, time'
+
+PROBE = PROBE_IMPORTS + '''
+preloaded = set(sys.modules)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('handler_module', {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.handler({{'method': 'OPTIONS', 'headers': {{}}}}, None)
+done = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'options_ms': (done - imported) * 1000,
+    'heavy_loaded': sorted(m for m in {heavy!r} if m in sys.modules and m not in preloaded)
+}}))
+'''
+
+
+def iter_importtime(stderr):
+    # (module, self time in us) from `python -X importtime` output
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        yield name.strip(), int(self_us)
+
+
+def run_importtime(code, root):
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=root,
+                          capture_output=True, text=True, check=True)
+
+
+def interpreter_modules(root=ROOT):
+    # Modules imported by interpreter startup and the probe itself
+    proc = run_importtime(PROBE_IMPORTS, root)
+    return {name for name, _ in iter_importtime(proc.stderr)}
+
+
+def measure(path, root=ROOT, baseline=frozenset()):
+    proc = run_importtime(PROBE.format(path=path, heavy=HEAVY_MODULES), root)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    packages = {}
+    for name, self_us in iter_importtime(proc.stderr):
+        if name not in baseline:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+    result['packages_us'] = packages
+    return result
+
+
+def benchmark(root=ROOT, runs=5):
+    # Best of `runs` fresh interpreters per handler, to filter out noise
+    baseline = interpreter_modules(root)
+    report = {}
+    for path in sorted(glob.glob(os.path.join(root, 'api', '*.py'))):
+        best = None
+        for _ in range(runs):
+            result = measure(path, root, baseline)
+            if best is None or result['import_ms'] < best['import_ms']:
+                best = result
+        report[os.path.relpath(path, root)] = best
+    return report
+
+
+def format_report(report, top=5):
+    lines = []
+    for path, result in report.items():
+        lines.append(f'{path}: import {result["import_ms"]:.1f} ms, '
+                     f'OPTIONS {result["options_ms"]:.2f} ms')
+        heavy = ', '.join(result['heavy_loaded']) or 'none'
+        lines.append(f'    heavy modules loaded after OPTIONS: {heavy}')
+        packages = sorted(result['packages_us'].items(), key=lambda item: -item[1])[:top]
+        for package, us in packages:
+            lines.append(f'    {us / 1000:8.1f} ms  {package}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m scraper.importtime',
+        description='Cold-start import cost of every api/*.py handler, broken down per package '
+                    '(from python -X importtime), plus what an OPTIONS preflight loads.'
+    )
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per handler')
+    parser.add_argument('--top', type=int, default=5, help='packages listed per handler')
+    parser.add_argument('--json', action='store_true', help='print the raw report as JSON')
+    args = parser.parse_args(argv)
+
+    report = benchmark(runs=args.runs)
+    print(json.dumps(report, indent=2) if args.json else format_report(report, args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
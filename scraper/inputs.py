@@ -0,0 +1,71 @@
+import csv
+import gzip
+import io
+import sys
+
+
+def open_text(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', errors='replace')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', errors='replace', newline='')
+    return open(path, 'r', encoding='utf-8-sig', errors='replace', newline='')
+
+
+HEADER_NAMES = {'domain', 'domains', 'url', 'urls', 'website', 'site', 'homepage'}
+SNIFF_ROWS = 20
+
+
+def looks_like_domain(value):
+    return '.' in value and ' ' not in value and '@' not in value
+
+
+def detect_column(rows):
+    # A header cell naming the column wins; otherwise pick the column in
+    # which most of the sampled rows hold something that looks like a domain
+    for _, row in rows[:1]:
+        for i, cell in enumerate(row):
+            if cell.strip().lower() in HEADER_NAMES:
+                return i
+    scores = {}
+    for _, row in rows:
+        for i, cell in enumerate(row):
+            if looks_like_domain(cell.strip()):
+                scores[i] = scores.get(i, 0) + 1
+    if not scores:
+        return 0
+    return max(sorted(scores), key=scores.get)
+
+
+def iter_rows(lines):
+    # Header and blank rows are skipped. Yields (line number, domain) so
+    # results can be mapped back to the input.
+    reader = csv.reader(lines)
+    sample = []
+    for row in reader:
+        sample.append((reader.line_num, row))
+        if len(sample) >= SNIFF_ROWS:
+            break
+    column = detect_column(sample)
+
+    def numbered():
+        yield from sample
+        for row in reader:
+            yield reader.line_num, row
+
+    for line_num, row in numbered():
+        if len(row) <= column:
+            continue
+        value = row[column].strip()
+        if value and looks_like_domain(value):
+            yield line_num, value
+
+
+def read_rows(path):
+    with open_text(path) as f:
+        yield from iter_rows(f)
+
+
+def read_domains(path):
+    for _, value in read_rows(path):
+        yield value
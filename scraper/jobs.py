@@ -0,0 +1,209 @@
+import json
+import sqlite3
+import time
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_domains (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated_at REAL,
+    UNIQUE (job_id, url)
+);
+CREATE INDEX IF NOT EXISTS job_domains_state ON job_domains (job_id, state, seq);
+'''
+
+# Lease columns used by the multi-process workers; added to older
+# databases when they are opened
+LEASE_COLUMNS = [
+    ('lease_owner', 'TEXT'),
+    ('lease_expires', 'REAL'),
+]
+
+
+class JobStore:
+    # Per-domain job state in SQLite. Results are buffered and committed in
+    # batches, so a crash loses at most one batch; those domains are still
+    # marked in-flight and are re-queued by resume().
+
+    def __init__(self, path, commit_every=200, commit_interval=5.0, busy_timeout=30.0):
+        # Several worker processes may share the database; writers wait for
+        # each other for up to busy_timeout seconds
+        self.conn = sqlite3.connect(path, timeout=busy_timeout)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        existing = {row[1] for row in self.conn.execute('PRAGMA table_info(job_domains)')}
+        for name, kind in LEASE_COLUMNS:
+            if name not in existing:
+                self.conn.execute(f'ALTER TABLE job_domains ADD COLUMN {name} {kind}')
+        self.conn.commit()
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.buffer = []
+        self.last_commit = time.monotonic()
+
+    def create_job(self, job_id, urls, source=None, chunk_size=1000):
+        # Returns True when the job is new, False when it already existed
+        created = self.conn.execute(
+            'INSERT OR IGNORE INTO jobs (job_id, source, created_at) VALUES (?, ?, ?)',
+            (job_id, source, time.time())
+        ).rowcount == 1
+        chunk = []
+        for url in urls:
+            chunk.append((job_id, url))
+            if len(chunk) >= chunk_size:
+                self._insert_urls(chunk)
+                chunk = []
+        if chunk:
+            self._insert_urls(chunk)
+        self.conn.commit()
+        return created
+
+    def _insert_urls(self, rows):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO job_domains (job_id, url) VALUES (?, ?)', rows
+        )
+
+    def resume(self, job_id, retry_failed=False):
+        states = (IN_FLIGHT, FAILED) if retry_failed else (IN_FLIGHT,)
+        placeholders = ', '.join('?' for _ in states)
+        self.conn.execute(
+            f'UPDATE job_domains SET state = ? WHERE job_id = ? AND state IN ({placeholders})',
+            (PENDING, job_id) + states
+        )
+        self.conn.commit()
+
+    def counts(self, job_id):
+        rows = self.conn.execute(
+            'SELECT state, COUNT(*) FROM job_domains WHERE job_id = ? GROUP BY state',
+            (job_id,)
+        )
+        counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def claim(self, job_id, limit):
+        rows = self.conn.execute(
+            'SELECT seq, url FROM job_domains WHERE job_id = ? AND state = ? ORDER BY seq LIMIT ?',
+            (job_id, PENDING, limit)
+        ).fetchall()
+        self.conn.executemany(
+            'UPDATE job_domains SET state = ?, attempts = attempts + 1, updated_at = ? WHERE seq = ?',
+            [(IN_FLIGHT, time.time(), seq) for seq, _ in rows]
+        )
+        return [url for _, url in rows]
+
+    def iter_pending(self, job_id, batch_size=500):
+        while True:
+            urls = self.claim(job_id, batch_size)
+            if not urls:
+                return
+            yield from urls
+
+    def record(self, job_id, url, result):
+        state = FAILED if result.get('error') else DONE
+        self.buffer.append((state, json.dumps(result), time.time(), job_id, url))
+        if (len(self.buffer) >= self.commit_every
+                or time.monotonic() - self.last_commit >= self.commit_interval):
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.conn.executemany(
+                'UPDATE job_domains SET state = ?, result = ?, updated_at = ? '
+                'WHERE job_id = ? AND url = ?',
+                self.buffer
+            )
+            self.buffer = []
+        self.conn.commit()
+        self.last_commit = time.monotonic()
+
+    # Leases, for workers in several processes sharing one database. A
+    # leased domain is in_flight until lease_expires; if its worker dies
+    # the lease runs out and the domain can be leased again. A result is
+    # only committed by the worker that still holds the lease, so every
+    # domain gets exactly one committed result.
+
+    def lease(self, job_id, worker_id, limit, visibility_timeout=60.0, max_attempts=3):
+        self.flush()
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Domains whose last lease ran out too often are given up
+            self.conn.execute(
+                'UPDATE job_domains SET state = ?, lease_owner = NULL, result = ? '
+                'WHERE job_id = ? AND state = ? AND attempts >= ? '
+                'AND (lease_expires IS NULL OR lease_expires < ?)',
+                (FAILED, json.dumps({'error': 'Lease expired too often'}),
+                 job_id, IN_FLIGHT, max_attempts, now)
+            )
+            rows = self.conn.execute(
+                'SELECT seq, url FROM job_domains WHERE job_id = ? AND (state = ? OR '
+                '(state = ? AND (lease_expires IS NULL OR lease_expires < ?))) '
+                'ORDER BY seq LIMIT ?',
+                (job_id, PENDING, IN_FLIGHT, now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE job_domains SET state = ?, attempts = attempts + 1, lease_owner = ?, '
+                'lease_expires = ?, updated_at = ? WHERE seq = ?',
+                [(IN_FLIGHT, worker_id, now + visibility_timeout, now, seq) for seq, _ in rows]
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return rows
+
+    def renew(self, worker_id, seqs, visibility_timeout=60.0):
+        expires = time.time() + visibility_timeout
+        self.conn.executemany(
+            'UPDATE job_domains SET lease_expires = ? '
+            'WHERE seq = ? AND lease_owner = ? AND state = ?',
+            [(expires, seq, worker_id, IN_FLIGHT) for seq in seqs]
+        )
+        self.conn.commit()
+
+    def complete(self, worker_id, items, max_attempts=3):
+        # Commits (seq, result) pairs in one transaction and returns how many
+        # were accepted; results whose lease was lost are discarded. Failures
+        # go back to pending until they have used up max_attempts.
+        committed = 0
+        now = time.time()
+        with self.conn:
+            for seq, result in items:
+                state = FAILED if result.get('error') else DONE
+                cursor = self.conn.execute(
+                    'UPDATE job_domains SET state = CASE WHEN ? = ? AND attempts < ? THEN ? ELSE ? END, '
+                    'result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? '
+                    'WHERE seq = ? AND lease_owner = ? AND state = ?',
+                    (state, FAILED, max_attempts, PENDING, state, json.dumps(result), now,
+                     seq, worker_id, IN_FLIGHT)
+                )
+                committed += cursor.rowcount
+        return committed
+
+    def iter_results(self, job_id):
+        rows = self.conn.execute(
+            'SELECT result FROM job_domains WHERE job_id = ? AND result IS NOT NULL ORDER BY seq',
+            (job_id,)
+        )
+        for (result,) in rows:
+            yield json.loads(result)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,101 @@
+import threading
+
+from .breaker import host_of
+from .cache import MAX_TRACKED, LRUDict
+
+# Smoothing as in TCP's retransmission timer (RFC 6298): the estimate is
+# mean + K * mean deviation, both exponentially weighted
+ALPHA = 0.125
+BETA = 0.25
+K = 4
+# Hosts with fewer samples than this get the caller's default timeout and
+# at most CONNECT_DEFAULT seconds to connect
+MIN_SAMPLES = 3
+CONNECT_DEFAULT = 5.0
+CONNECT_FLOOR = 2.0
+READ_FLOOR = 4.0
+MAX_TIMEOUT = 30.0
+# Each timeout doubles the host's timeouts, up to this factor, until it
+# answers in time again; this is how slow origins learn past the default
+MAX_BACKOFF = 4
+
+
+class Estimate:
+    __slots__ = ('mean', 'dev')
+
+    def __init__(self, sample):
+        self.mean = sample
+        self.dev = sample / 2
+
+    def add(self, sample):
+        self.dev += BETA * (abs(sample - self.mean) - self.dev)
+        self.mean += ALPHA * (sample - self.mean)
+
+    def bound(self, k=K):
+        return self.mean + k * self.dev
+
+
+class LatencyTracker:
+    # Rolling per-host estimates of time to first byte and total fetch time,
+    # used to size each host's connect and read timeouts
+
+    def __init__(self, max_hosts=MAX_TRACKED):
+        self.hosts = LRUDict(max_hosts)
+        self.lock = threading.Lock()
+
+    def state(self, url):
+        host = host_of(url)
+        state = self.hosts.touch(host)
+        if state is None:
+            state = self.hosts[host] = {'ttfb': None, 'total': None, 'samples': 0,
+                                        'backoff': 1}
+        return state
+
+    def record(self, url, ttfb, total):
+        with self.lock:
+            state = self.state(url)
+            if state['samples']:
+                state['ttfb'].add(ttfb)
+                state['total'].add(total)
+            else:
+                state['ttfb'] = Estimate(ttfb)
+                state['total'] = Estimate(total)
+            state['samples'] += 1
+            state['backoff'] = 1
+
+    def record_timeout(self, url):
+        with self.lock:
+            state = self.state(url)
+            state['backoff'] = min(state['backoff'] * 2, MAX_BACKOFF)
+
+    def timeouts(self, url, default):
+        # (connect, read) timeouts for the host: `default` until it has been
+        # sampled, then its own estimate, which may be well above or below
+        with self.lock:
+            state = self.hosts.get(host_of(url))
+            backoff = 1 if state is None else state['backoff']
+            if state is None or state['samples'] < MIN_SAMPLES:
+                connect, read = min(CONNECT_DEFAULT, default), default
+            else:
+                connect = max(CONNECT_FLOOR, state['ttfb'].bound())
+                read = max(READ_FLOOR, state['total'].bound())
+        return min(connect * backoff, MAX_TIMEOUT), min(read * backoff, MAX_TIMEOUT)
+
+    def mean_total(self, url):
+        # Average total fetch time, None while unknown
+        with self.lock:
+            state = self.hosts.get(host_of(url))
+            if state is None or state['samples'] < MIN_SAMPLES:
+                return None
+            return state['total'].mean
+
+    def ttfb_p95(self, url):
+        # Rough 95th percentile of time to first byte, None while unknown
+        with self.lock:
+            state = self.hosts.get(host_of(url))
+            if state is None or state['samples'] < MIN_SAMPLES:
+                return None
+            return state['ttfb'].bound(k=2)
+
+
+LATENCY = LatencyTracker()
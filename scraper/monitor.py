@@ -0,0 +1,69 @@
+from .breaker import error_kind
+from .engine import fetch_final
+from .extract import empty_result, extract_pricing, fingerprint, timestamp
+from .fetch import normalize_url
+from .fingerprints import check_page
+
+WATCHED_FIELDS = ['plan_name', 'price', 'billing_period', 'features', 'error']
+
+
+class Monitor:
+    # Incremental re-scraping against a ResultStore. Workers fetch and
+    # fingerprint each page and only run extraction when the fingerprint
+    # differs from the stored one; unchanged pages carry their previous
+    # result forward. All store access happens on the caller's thread.
+
+    def __init__(self, store):
+        self.store = store
+        self.known = store.fingerprints()
+
+    def scrape(self, url, timeout=10):
+        url = normalize_url(url)
+        try:
+            response = fetch_final(url, timeout=timeout)
+            check_page(response, timeout=timeout)
+            content_hash = fingerprint(response.content)
+            if self.known.get(url) == content_hash:
+                return {'url': url, 'content_hash': content_hash, 'unchanged': True}
+            return extract_pricing(url, response.content, response.headers)
+        except Exception as e:
+            return empty_result(url, error=str(e))
+
+    def record(self, result):
+        # Stores the result and returns a diff record, or None if nothing changed
+        url = result['url']
+        previous = self.store.latest_for_url(url)
+        if result.pop('unchanged', False) and previous is not None:
+            result = dict(previous, timestamp=timestamp())
+            result.pop('scraped_at', None)
+            self.store.add_many([result])
+            return result, None
+
+        self.store.add_many([result])
+        if result.get('content_hash'):
+            self.known[url] = result['content_hash']
+        if previous is None:
+            return result, {'url': url, 'status': 'new', 'timestamp': result['timestamp'],
+                            'changes': {field: [None, result.get(field)]
+                                        for field in WATCHED_FIELDS if result.get(field)}}
+        changes = diff(previous, result)
+        if not changes:
+            return result, None
+        return result, {'url': url, 'status': 'changed', 'timestamp': result['timestamp'],
+                        'changes': changes}
+
+
+def diff(old, new):
+    changes = {}
+    for field in WATCHED_FIELDS:
+        before = old.get(field) or None
+        after = new.get(field) or None
+        if field == 'error':
+            # Repeats of one failure differ in addresses and countdowns; only
+            # a different kind of failure is a change
+            before_key, after_key = error_kind(before), error_kind(after)
+        else:
+            before_key, after_key = before, after
+        if before_key != after_key:
+            changes[field] = [before, after]
+    return changes
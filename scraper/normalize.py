@@ -0,0 +1,123 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .extract import empty_result
+
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'ref', 'ref_src'
+}
+TRACKING_PREFIXES = ('utm_', 'hsa_', 'pk_')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_host(host):
+    host = host.strip().rstrip('.').lower()
+    if not host or ' ' in host:
+        return None
+    if host.isascii():
+        try:
+            # Only checks label lengths for ascii names
+            return host.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    # Internationalised names are fetched and deduplicated as punycode, per
+    # IDNA2008 (the idna package requests depends on): Python's own codec
+    # is IDNA2003 and turns straße.de into strasse.de, another domain
+    import idna
+
+    try:
+        return idna.encode(host, uts46=True).decode('ascii')
+    except (idna.IDNAError, UnicodeError):
+        return None
+
+
+def canonicalize(url, strip_www=True, strip_trailing_slash=True):
+    # Returns the canonical form of a domain or url, or None if it is not usable
+    url = url.strip()
+    if not url:
+        return None
+    if '://' not in url:
+        url = 'https://' + url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return None
+    host = canonicalize_host(parts.hostname or '')
+    if not host or ('.' not in host and host != 'localhost'):
+        return None
+    if strip_www and host.startswith('www.') and host.count('.') > 1:
+        host = host[4:]
+    netloc = host
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f'{host}:{port}'
+
+    path = parts.path or ''
+    if strip_trailing_slash:
+        path = path.rstrip('/')
+    query = urlencode([
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ])
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+class DomainIndex:
+    # Maps every canonical url to the input rows it came from, so each url is
+    # fetched once and its result can be fanned back out to all of its rows.
+    # www. only matters for deduplication: the url fetched keeps the host of
+    # the first row that named it.
+
+    def __init__(self, strip_www=True, strip_trailing_slash=True):
+        self.strip_www = strip_www
+        self.strip_trailing_slash = strip_trailing_slash
+        self.rows = {}
+        self.keys = {}
+        self.invalid = []
+        self.total = 0
+
+    def add(self, raw, row=None):
+        # Returns the canonical url the first time it is seen, otherwise None
+        self.total += 1
+        key = canonicalize(raw, self.strip_www, self.strip_trailing_slash)
+        if key is None:
+            self.invalid.append((row, raw))
+            return None
+        if key in self.keys:
+            self.rows[self.keys[key]].append((row, raw))
+            return None
+        canonical = canonicalize(raw, False, self.strip_trailing_slash)
+        self.keys[key] = canonical
+        self.rows[canonical] = [(row, raw)]
+        return canonical
+
+    def add_all(self, rows):
+        for row, raw in rows:
+            self.add(raw, row)
+        return self
+
+    def urls(self):
+        return iter(self.rows)
+
+    @property
+    def duplicates(self):
+        return self.total - len(self.invalid) - len(self.rows)
+
+    def expand(self, result):
+        # One copy of the result per original input row
+        for row, raw in self.rows.get(result['url'], [(None, result['url'])]):
+            yield dict(result, input=raw, row=row)
+
+    def invalid_results(self):
+        for row, raw in self.invalid:
+            yield dict(empty_result(raw, error='Invalid domain'), input=raw, row=row)
@@ -0,0 +1,73 @@
+import csv
+import json
+import sys
+
+CSV_FIELDS = ['input', 'row', 'url', 'plan_name', 'price', 'billing_period', 'features', 'timestamp', 'error']
+
+
+def csv_row(result):
+    row = dict(result, features='; '.join(result.get('features') or []))
+    return [row.get(field, '') for field in CSV_FIELDS]
+
+
+class CSVWriter:
+    def __init__(self, f, header=True):
+        self.f = f
+        self.writer = csv.writer(f)
+        if header:
+            self.writer.writerow(CSV_FIELDS)
+
+    def write(self, result):
+        self.writer.writerow(csv_row(result))
+        self.f.flush()
+
+
+class NDJSONWriter:
+    def __init__(self, f, header=True):
+        self.f = f
+
+    def write(self, result):
+        self.f.write(json.dumps(result) + '\n')
+        self.f.flush()
+
+
+class DiffCSVWriter:
+    # One row per changed field of a monitoring diff
+    FIELDS = ['url', 'status', 'field', 'old', 'new', 'timestamp']
+
+    def __init__(self, f, header=True):
+        self.f = f
+        self.writer = csv.writer(f)
+        if header:
+            self.writer.writerow(self.FIELDS)
+
+    def write(self, change):
+        for field, (old, new) in change['changes'].items():
+            self.writer.writerow([change['url'], change['status'], field,
+                                  format_value(old), format_value(new), change['timestamp']])
+        self.f.flush()
+
+
+def format_value(value):
+    if isinstance(value, list):
+        return '; '.join(value)
+    return '' if value is None else value
+
+
+WRITERS = {
+    'csv': CSVWriter,
+    'ndjson': NDJSONWriter
+}
+
+DIFF_WRITERS = {
+    'csv': DiffCSVWriter,
+    'ndjson': NDJSONWriter
+}
+
+
+def open_output(path, fmt, append=False, writers=WRITERS):
+    if path == '-':
+        return sys.stdout, writers[fmt](sys.stdout)
+    f = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+    # Only write a header into an empty file
+    return f, writers[fmt](f, header=f.tell() == 0)
@@ -0,0 +1,252 @@
+import json
+import re
+
+from .extract import AMOUNT_RE, CURRENCY_SYMBOLS
+
+# Site builders recognised from response headers: (platform, header,
+# substring of its value; '' matches any value)
+HEADER_SIGNATURES = [
+    ('nextjs', 'x-powered-by', 'next.js'),
+    ('nextjs', 'x-nextjs-cache', ''),
+    ('hubspot', 'x-hs-cache-config', ''),
+    ('hubspot', 'x-hs-content-id', ''),
+    ('wordpress', 'link', 'api.w.org'),
+]
+
+# ... or from markup: (platform, byte patterns)
+MARKUP_SIGNATURES = [
+    ('webflow', (b'data-wf-site=', b'data-wf-page=', b'content="Webflow"')),
+    ('hubspot', (b'hs_cos_wrapper', b'js.hs-scripts.com', b'content="HubSpot"')),
+    ('wordpress', (b'/wp-content/', b'/wp-includes/', b'content="WordPress')),
+    ('nextjs', (b'id="__NEXT_DATA__"', b'/_next/static/')),
+]
+
+# Pricing cards of each platform's usual layouts. A layout is only tried
+# when one of its `markers` occurs in the page, and then only elements whose
+# class matches `strain` are parsed; the card's fields are found with CSS
+# selectors, and the first card with a price in it is the result.
+LAYOUTS = {
+    'wordpress': [
+        # Elementor price table widget
+        {'markers': (b'elementor-price-table',),
+         'strain': r'^elementor-price-table$',
+         'card': '.elementor-price-table',
+         'plan': '.elementor-price-table__heading',
+         'price': '.elementor-price-table__price',
+         'fraction': '.elementor-price-table__fractional-part',
+         'period': '.elementor-price-table__period',
+         'features': '.elementor-price-table__features-list li'},
+        # Easy Pricing Tables
+        {'markers': (b'ptp-col', b'ptp-item-container'),
+         'strain': r'^ptp-(col|item-container)$',
+         'card': '.ptp-col, .ptp-item-container',
+         'plan': '.ptp-plan',
+         'price': '.ptp-price',
+         'period': '.ptp-price-period',
+         'features': '.ptp-bullet-item'},
+    ],
+    'hubspot': [
+        # Pricing card module of the HubSpot CMS themes
+        {'markers': (b'pricing-card',),
+         'strain': r'^pricing-card$',
+         'card': '.pricing-card',
+         'plan': '.pricing-card__heading, .pricing-card__title',
+         'price': '.pricing-card__price',
+         'period': '.pricing-card__period, .pricing-card__timeframe',
+         'features': '.pricing-card__features li, .pricing-card__feature'},
+    ],
+    'webflow': [
+        # Client-First and Relume class naming (pricing_card, pricing-plan, ...)
+        {'markers': (b'pricing_card', b'pricing-card', b'pricing_plan', b'pricing-plan'),
+         'strain': r'^pricing[_-](card|plan)',
+         'card': '[class*="pricing_card"], [class*="pricing-card"], '
+                 '[class*="pricing_plan"], [class*="pricing-plan"]',
+         'plan': '[class*="plan-name"], [class*="plan_name"], [class*="heading"], h2, h3',
+         'price': '[class*="price"]',
+         'period': '[class*="period"], [class*="billing"]',
+         'features': '[class*="feature"] li, ul li'},
+    ],
+}
+
+NEXT_DATA_RE = re.compile(rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+# Keys of a plan object in __NEXT_DATA__, most specific first
+PRICE_KEYS = ('price', 'monthlyPrice', 'priceMonthly', 'monthly_price', 'amount',
+              'unit_amount', 'unitAmount')
+NAME_KEYS = ('planName', 'plan_name', 'name', 'title')
+PERIOD_KEYS = ('interval', 'billingPeriod', 'billing_period', 'period')
+# Stripe amounts, which are in cents
+CENT_KEYS = ('unit_amount', 'unitAmount')
+# Keys whose value holds the plans: plans, pricing, pricingTiers, packages...
+PLAN_KEY_RE = re.compile(r'plan|pric|tier|package|subscription', re.I)
+SYMBOLS = {code: symbol for symbol, code in CURRENCY_SYMBOLS.items()}
+MAX_FEATURES = 50
+
+
+def detect_platform(content, headers=None):
+    # Platform key of the site that served the page, or None. Byte checks
+    # only; nothing is parsed.
+    for platform, name, needle in HEADER_SIGNATURES:
+        value = headers.get(name) if headers is not None else None
+        if value is not None and needle in value.lower():
+            return platform
+    for platform, needles in MARKUP_SIGNATURES:
+        if any(needle in content for needle in needles):
+            return platform
+    return None
+
+
+def squeeze(element, skip=()):
+    # Visible text of the element without the text of the `skip` elements
+    if element is None:
+        return ''
+    words = []
+    for string in element.find_all(string=True):
+        if not any(parent is skipped for parent in string.parents for skipped in skip):
+            words.extend(string.split())
+    return ' '.join(words)
+
+
+def select_plan(content, layout):
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    strainer = SoupStrainer(class_=re.compile(layout['strain']))
+    soup = BeautifulSoup(content, 'html.parser', parse_only=strainer)
+    for card in soup.select(layout['card']):
+        price = card.select_one(layout['price'])
+        period = card.select_one(layout['period'])
+        fraction = card.select_one(layout['fraction']) if 'fraction' in layout else None
+        # Prices split over several elements ($ | 29 | 99) are joined up;
+        # a period shown inside the price is left out
+        skip = [element for element in (period, fraction) if element is not None]
+        amount = ''.join(squeeze(price, skip).split())
+        if not AMOUNT_RE.search(amount):
+            continue
+        if fraction is not None and squeeze(fraction):
+            amount += '.' + ''.join(squeeze(fraction).split())
+        features = [squeeze(item) for item in card.select(layout['features'])]
+        return {
+            'plan_name': squeeze(card.select_one(layout['plan'])),
+            'price': amount,
+            'billing_period': squeeze(period),
+            'features': [feature for feature in features if feature][:MAX_FEATURES],
+        }
+    return None
+
+
+def extract_layout(platform):
+    def extract(content):
+        for layout in LAYOUTS[platform]:
+            if not any(marker in content for marker in layout['markers']):
+                continue
+            plan = select_plan(content, layout)
+            if plan is not None:
+                return plan
+        return None
+    return extract
+
+
+def first_key(item, keys):
+    return next((item[key] for key in keys if item.get(key) not in (None, '')), None)
+
+
+def format_price(item):
+    key = next((key for key in PRICE_KEYS if item.get(key) not in (None, '')), None)
+    value = item[key] if key is not None else None
+    if isinstance(value, dict):
+        # {'amount': 29, 'currency': 'USD'} and friends
+        return format_price(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return ''
+    if isinstance(value, str):
+        return value.strip() if AMOUNT_RE.search(value) else ''
+    if key in CENT_KEYS:
+        # Stripe prices are in cents
+        value = value / 100
+    currency = str(item.get('currency') or 'usd').upper()
+    return f'{SYMBOLS.get(currency, currency + " ")}{value:g}'
+
+
+def plan_of(item):
+    # Plan fields of one object, or None unless it has a name and a price
+    name = first_key(item, NAME_KEYS)
+    price = format_price(item)
+    if not isinstance(name, str) or not price:
+        return None
+    features = item.get('features') or []
+    if not isinstance(features, list):
+        features = []
+    features = [feature if isinstance(feature, str) else first_key(feature, NAME_KEYS)
+                for feature in features if isinstance(feature, (str, dict))]
+    period = first_key(item, PERIOD_KEYS)
+    return {
+        'plan_name': name.strip(),
+        'price': price,
+        'billing_period': period if isinstance(period, str) else '',
+        'features': [f.strip() for f in features if isinstance(f, str)][:MAX_FEATURES],
+    }
+
+
+def first_plan(items):
+    return next((plan for plan in map(plan_of, items) if plan is not None), None)
+
+
+def plans_under(value):
+    # Objects that count as plans below a plans-like key: the value itself,
+    # or its entries ({'plans': [...]} and {'plans': {'pro': {...}}})
+    if isinstance(value, dict):
+        return [value] + [child for child in value.values() if isinstance(child, dict)]
+    if isinstance(value, list):
+        return [child for child in value if isinstance(child, dict)]
+    return []
+
+
+def find_plan(data, depth=0):
+    # Depth-first search for the first plan. Any object with a name and a
+    # price is not enough (navigation and counters have those too): it has
+    # to sit under a plans-like key, or among siblings that carry prices too.
+    if depth > 30:
+        return None
+    if isinstance(data, dict):
+        children = data.items()
+    elif isinstance(data, list):
+        priced = [item for item in data
+                  if isinstance(item, dict) and first_key(item, PRICE_KEYS) is not None]
+        if len(priced) >= 2:
+            plan = first_plan(priced)
+            if plan is not None:
+                return plan
+        children = ((None, child) for child in data)
+    else:
+        return None
+    for key, child in children:
+        if isinstance(key, str) and PLAN_KEY_RE.search(key):
+            plan = first_plan(plans_under(child))
+            if plan is not None:
+                return plan
+        plan = find_plan(child, depth + 1)
+        if plan is not None:
+            return plan
+    return None
+
+
+def extract_next_data(content):
+    # Pages rendered by the Next.js pages router carry their props as JSON;
+    # reading it needs no HTML parse at all
+    match = NEXT_DATA_RE.search(content)
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return None
+    return find_plan(data.get('props', data) if isinstance(data, dict) else data)
+
+
+# Specialised extractors by platform: extractor(content) returns the plan
+# fields, or None to fall back to the generic heuristics
+EXTRACTORS = {
+    'nextjs': extract_next_data,
+    'hubspot': extract_layout('hubspot'),
+    'webflow': extract_layout('webflow'),
+    'wordpress': extract_layout('wordpress'),
+}
@@ -0,0 +1,54 @@
+import sys
+import time
+
+
+class Progress:
+    def __init__(self, total=None, stream=None, interval=1.0, limiter=None):
+        self.total = total
+        self.limiter = limiter
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.last_report = 0
+
+    def update(self, result):
+        self.done += 1
+        if result.get('error'):
+            self.failed += 1
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def set(self, done, failed):
+        # For runs whose results are counted elsewhere (worker processes)
+        self.done = done
+        self.failed = failed
+        self.report()
+
+    def report(self, now=None, end='\r'):
+        elapsed = (now or time.monotonic()) - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = f'{self.done}'
+        if self.total:
+            line += f'/{self.total} ({self.done * 100 // self.total}%)'
+        line += f' done, {self.failed} failed, {rate:.1f} urls/s'
+        if self.limiter is not None:
+            line += f', concurrency {self.limiter.limit}'
+        if self.total and rate > 0:
+            remaining = (self.total - self.done) / rate
+            line += f', eta {format_duration(remaining)}'
+        self.stream.write(line + end)
+        self.stream.flush()
+
+    def finish(self):
+        self.report(end='\n')
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f'{hours:d}:{minutes:02d}:{seconds:02d}'
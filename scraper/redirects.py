@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+from .cache import MAX_TRACKED, LRUDict
+
+# Seconds a url's redirect target is trusted before the chain is followed
+# again from the start
+REDIRECT_TTL = float(os.environ.get('SCRAPE_REDIRECT_TTL', 86400))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS redirects (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+'''
+
+
+class RedirectCache:
+    # Where each input url ended up after following its redirects, so the
+    # next fetch can go there directly. Entries use wall-clock expiry so they
+    # can be saved to and loaded from a SQLite file between runs.
+
+    def __init__(self, ttl=REDIRECT_TTL, max_entries=MAX_TRACKED, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = LRUDict(max_entries)
+        self.lock = threading.Lock()
+
+    def lookup(self, url):
+        # The url's last final url, or None if it is unknown or expired
+        with self.lock:
+            entry = self.entries.touch(url)
+            if entry is None:
+                return None
+            final_url, expires = entry
+            if self.clock() >= expires:
+                del self.entries[url]
+                return None
+            return final_url
+
+    def store(self, url, response):
+        # Only a response that was redirected says anything new; fetching a
+        # known final url directly keeps the entry and its expiry
+        if not response.history or response.url == url:
+            return
+        self.add(url, response.url, self.clock() + self.ttl)
+
+    def add(self, url, final_url, expires):
+        with self.lock:
+            self.entries[url] = (final_url, expires)
+
+    def forget(self, url):
+        with self.lock:
+            self.entries.pop(url, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, path):
+        # Adds the unexpired entries saved in the SQLite file at `path`
+        import sqlite3
+
+        conn = sqlite3.connect(path)
+        try:
+            conn.executescript(SCHEMA)
+            rows = conn.execute('SELECT url, final_url, expires FROM redirects '
+                                'WHERE expires > ? ORDER BY expires', (self.clock(),))
+            for url, final_url, expires in rows:
+                self.add(url, final_url, expires)
+        finally:
+            conn.close()
+
+    def save(self, path):
+        import sqlite3
+
+        now = self.clock()
+        with self.lock:
+            rows = [(url, final_url, expires)
+                    for url, (final_url, expires) in self.entries.items() if expires > now]
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                conn.executescript(SCHEMA)
+                # Replaced wholesale: urls forgotten since the load go too
+                conn.execute('DELETE FROM redirects')
+                conn.executemany('INSERT OR REPLACE INTO redirects (url, final_url, expires) '
+                                 'VALUES (?, ?, ?)', rows)
+        finally:
+            conn.close()
+
+
+# Loaded and saved around a run by the cli's --redirects option
+REDIRECTS = RedirectCache()
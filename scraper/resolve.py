@@ -0,0 +1,163 @@
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
+
+from .cache import MAX_TRACKED, LRUDict
+from .fetch import normalize_url
+
+# Answers are cached for POSITIVE_TTL seconds, failures for NEGATIVE_TTL
+POSITIVE_TTL = float(os.environ.get('SCRAPE_DNS_TTL', 300))
+NEGATIVE_TTL = float(os.environ.get('SCRAPE_DNS_NEGATIVE_TTL', 120))
+RESOLVER_WORKERS = 32
+# getaddrinfo raises UnicodeError for names that cannot be IDNA-encoded
+RESOLVE_ERRORS = (OSError, UnicodeError)
+
+
+def hostname_of(url):
+    # The name to resolve: no port, unlike breaker.host_of
+    return urlsplit(normalize_url(url)).hostname
+
+
+class DNSCache:
+    # getaddrinfo on a small thread pool, with positive and negative answers
+    # cached per host and concurrent lookups of one host coalesced
+
+    def __init__(self, workers=RESOLVER_WORKERS, positive_ttl=POSITIVE_TTL,
+                 negative_ttl=NEGATIVE_TTL, max_hosts=MAX_TRACKED, clock=time.monotonic):
+        self.workers = workers
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.entries = LRUDict(max_hosts)
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers)
+        return self._pool
+
+    def lookup(self, host):
+        # Cached addresses, or None if the host is not cached; raises the
+        # cached error for hosts that failed to resolve
+        with self.lock:
+            entry = self.entries.touch(host)
+            if entry is None:
+                return None
+            expires, addresses, error = entry
+            if self.clock() >= expires:
+                del self.entries[host]
+                return None
+        if error is not None:
+            # A fresh exception each time; re-raising one instance would keep
+            # growing its traceback
+            cls, args = error
+            raise cls(*args)
+        return addresses
+
+    def submit(self, host):
+        # Future of the host's addresses; fails with socket.gaierror
+        future = Future()
+        try:
+            addresses = self.lookup(host)
+        except RESOLVE_ERRORS as e:
+            future.set_exception(e)
+            return future
+        if addresses is not None:
+            future.set_result(addresses)
+            return future
+        with self.lock:
+            pending = self.inflight.get(host)
+            if pending is not None:
+                return pending
+            self.inflight[host] = future
+        self.pool.submit(self.run, host, future)
+        return future
+
+    def resolve(self, host):
+        return self.submit(host).result()
+
+    def run(self, host, future):
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            error = None
+        except RESOLVE_ERRORS as e:
+            addresses = None
+            error = e
+        ttl = self.positive_ttl if error is None else self.negative_ttl
+        with self.lock:
+            cached = None if error is None else (type(error), error.args)
+            self.entries[host] = (self.clock() + ttl, addresses, cached)
+            self.inflight.pop(host, None)
+        if error is None:
+            future.set_result(addresses)
+        else:
+            future.set_exception(error)
+
+
+DNS = DNSCache()
+
+
+def resolve_ahead(urls, window=64, cache=DNS, deadline=None):
+    # Yields (url, error) in input order while keeping up to `window`
+    # lookups in flight ahead of the consumer; error is the resolver's
+    # exception for hosts that do not resolve, else None. A lookup still
+    # running when the deadline passes is left to the fetch.
+    ahead = deque()
+
+    def settle(url, future):
+        if future is None:
+            return url, None
+        try:
+            future.result(timeout=None if deadline is None else deadline.remaining())
+            return url, None
+        except FutureTimeout:
+            return url, None
+        except RESOLVE_ERRORS as e:
+            return url, e
+
+    for url in urls:
+        host = hostname_of(url)
+        ahead.append((url, cache.submit(host) if host else None))
+        if len(ahead) >= window:
+            yield settle(*ahead.popleft())
+    while ahead:
+        yield settle(*ahead.popleft())
+
+
+def dns_error(url, error):
+    reason = getattr(error, 'strerror', None) or error
+    return f'DNS lookup failed for {hostname_of(url)}: {reason}'
+
+
+def install_urllib3(cache=DNS):
+    # Route requests' connections through the cache so hosts resolved ahead
+    # of time are not looked up again, and cached failures fail at once
+    from urllib3.util import connection
+
+    original = connection.create_connection
+    if getattr(original, 'dns_cache', None) is cache:
+        return
+
+    def create_connection(address, *args, **kwargs):
+        host, port = address
+        addresses = cache.lookup(host)
+        if not addresses:
+            return original(address, *args, **kwargs)
+        for ip in addresses[:-1]:
+            try:
+                return original((ip, port), *args, **kwargs)
+            except OSError:
+                pass
+        return original((addresses[-1], port), *args, **kwargs)
+
+    create_connection.dns_cache = cache
+    connection.create_connection = create_connection
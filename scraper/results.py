@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from .extract import normalize_price
+from .normalize import canonicalize
+
+DEFAULT_PATH = os.environ.get('SCRAPER_DB', '/tmp/scraper_results.db')
+
+_local = threading.local()
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT,
+    url TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest (
+    domain TEXT PRIMARY KEY,
+    result_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest_url (
+    url TEXT PRIMARY KEY,
+    result_id INTEGER NOT NULL
+);
+'''
+
+# Columns added to results after the first release; old databases are
+# migrated in place when they are opened
+COLUMNS = [
+    ('domain', 'TEXT'),
+    ('plan', 'TEXT'),
+    ('price', 'REAL'),
+    ('currency', 'TEXT'),
+    ('period', 'TEXT'),
+    ('content_hash', 'TEXT'),
+]
+
+INDEXES = '''
+CREATE INDEX IF NOT EXISTS results_batch ON results (batch, id);
+CREATE INDEX IF NOT EXISTS results_domain_time ON results (domain, scraped_at);
+CREATE INDEX IF NOT EXISTS results_plan_price ON results (plan, price);
+'''
+
+PERIODS = {
+    'month': 'month', 'monthly': 'month', 'mo': 'month',
+    'year': 'year', 'yearly': 'year', 'annual': 'year', 'annually': 'year', 'yr': 'year',
+    'quarter': 'quarter', 'quarterly': 'quarter',
+    'week': 'week', 'weekly': 'week',
+}
+
+
+def to_epoch(value):
+    # Accepts epoch seconds, datetimes and ISO 8601 strings
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def domain_of(url):
+    # Domain key of a url or bare domain, in the same canonical form the
+    # scrapers use, so 'www.Notion.so' and 'https://notion.so/' match
+    return urlsplit(canonicalize(url) or url).hostname or url.lower()
+
+
+def normalize_period(period):
+    return PERIODS.get((period or '').strip().lower().lstrip('/').strip(), period or None)
+
+
+class ResultStore:
+    # Every scrape result as a time-series row per domain. The latest table
+    # points at the newest row of each domain for primary-key lookups.
+
+    def __init__(self, path=None):
+        import sqlite3
+
+        self.conn = sqlite3.connect(path or DEFAULT_PATH)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        existing = {row[1] for row in self.conn.execute('PRAGMA table_info(results)')}
+        for name, kind in COLUMNS:
+            if name not in existing:
+                self.conn.execute(f'ALTER TABLE results ADD COLUMN {name} {kind}')
+        self.conn.executescript(INDEXES)
+        self.conn.commit()
+
+    def row_for(self, result, batch, now):
+        amount, currency = normalize_price(result.get('price'))
+        return (
+            batch, result['url'], now, json.dumps(result), domain_of(result['url']),
+            result.get('plan_name') or None, amount, currency,
+            normalize_period(result.get('billing_period')), result.get('content_hash')
+        )
+
+    def add_many(self, results, batch=None, scraped_at=None):
+        now = scraped_at or time.time()
+        seen = set()
+        with self.conn:
+            for result in results:
+                row = self.row_for(result, batch, now)
+                if result['url'] in seen:
+                    # The same fetch fanned out to several input rows is kept
+                    # for the batch export but only once in the price history
+                    row = row[:4] + (None,) * 6
+                seen.add(result['url'])
+                cursor = self.conn.execute(
+                    'INSERT INTO results (batch, url, scraped_at, data, domain, plan, price, '
+                    'currency, period, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    row
+                )
+                if row[4] is not None:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO latest (domain, result_id) VALUES (?, ?)',
+                        (row[4], cursor.lastrowid)
+                    )
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO latest_url (url, result_id) VALUES (?, ?)',
+                        (result['url'], cursor.lastrowid)
+                    )
+
+    def iter_results(self, batch=None):
+        # The cursor is consumed lazily, so exports run in constant memory
+        if batch is None:
+            rows = self.conn.execute('SELECT data FROM results ORDER BY id')
+        else:
+            rows = self.conn.execute(
+                'SELECT data FROM results WHERE batch = ? ORDER BY id', (batch,)
+            )
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def latest(self, domain):
+        row = self.conn.execute(
+            'SELECT r.data, r.scraped_at FROM latest l JOIN results r ON r.id = l.result_id '
+            'WHERE l.domain = ?',
+            (domain_of(domain),)
+        ).fetchone()
+        return self.decode(row) if row else None
+
+    def latest_for_url(self, url):
+        row = self.conn.execute(
+            'SELECT r.data, r.scraped_at FROM latest_url l JOIN results r ON r.id = l.result_id '
+            'WHERE l.url = ?',
+            (url,)
+        ).fetchone()
+        return self.decode(row) if row else None
+
+    def fingerprints(self):
+        # url -> content fingerprint of its newest result
+        rows = self.conn.execute(
+            'SELECT l.url, r.content_hash FROM latest_url l JOIN results r ON r.id = l.result_id '
+            'WHERE r.content_hash IS NOT NULL'
+        )
+        return dict(rows)
+
+    def history(self, domain, since=None, until=None, limit=None):
+        return self.query(domain=domain_of(domain), since=since, until=until, limit=limit)
+
+    def query(self, domain=None, plan=None, min_price=None, max_price=None, currency=None,
+              since=None, until=None, limit=None):
+        clauses = ['domain IS NOT NULL']
+        params = []
+        for column, op, value in [
+            ('domain', '=', domain),
+            ('plan', '=', plan),
+            ('currency', '=', currency),
+            ('price', '>=', min_price),
+            ('price', '<=', max_price),
+            ('scraped_at', '>=', to_epoch(since)),
+            ('scraped_at', '<', to_epoch(until)),
+        ]:
+            if value is not None:
+                clauses.append(f'{column} {op} ?')
+                params.append(value)
+        sql = 'SELECT data, scraped_at FROM results WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY scraped_at DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        for row in self.conn.execute(sql, params):
+            yield self.decode(row)
+
+    def decode(self, row):
+        data, scraped_at = row
+        result = json.loads(data)
+        result['scraped_at'] = datetime.fromtimestamp(scraped_at).isoformat(timespec='seconds')
+        return result
+
+    def close(self):
+        self.conn.close()
+
+
+def shared_store(path=None):
+    # One open store per thread and database, reused across requests so the
+    # schema check and connection setup are paid once per thread
+    path = path or DEFAULT_PATH
+    if not hasattr(_local, 'stores'):
+        _local.stores = {}
+    store = _local.stores.get(path)
+    if store is None:
+        store = _local.stores[path] = ResultStore(path)
+    return store
+
+
+def save_results(results, batch=None, path=None):
+    # Storing is best effort: a read-only or full disk must not lose the
+    # results the caller is waiting for
+    import sqlite3
+
+    try:
+        shared_store(path).add_many(results, batch=batch)
+        return True
+    except sqlite3.Error:
+        return False
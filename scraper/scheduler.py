@@ -0,0 +1,175 @@
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS schedule (
+    url TEXT PRIMARY KEY,
+    next_due REAL NOT NULL,
+    interval REAL NOT NULL,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    last_checked REAL
+);
+'''
+
+
+class RateLimiter:
+    # Token bucket allowing `rate` acquisitions per second on average
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self):
+        with self.lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+    def acquire(self):
+        while not self.try_acquire():
+            time.sleep(self.wait_time())
+
+
+class Scheduler:
+    # Keeps every url in a heap ordered by when it is next due. Each check
+    # adapts the url's revisit interval: a page that changed is revisited
+    # twice as soon, one that did not backs off by 25%, within
+    # [min_interval, max_interval]. Due urls are fed to a thread pool no
+    # faster than `rate` per second. State lives in a SQLite table so a
+    # restarted scheduler picks up where it left off; it shares the result
+    # store's connection so both can write without locking each other out.
+
+    def __init__(self, conn, rate=2.0, interval=DAY, min_interval=HOUR, max_interval=30 * DAY,
+                 retry_interval=HOUR, commit_every=100):
+        self.conn = conn
+        self.conn.executescript(SCHEMA)
+        self.limiter = RateLimiter(rate)
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.retry_interval = retry_interval
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.heap = []
+        self.intervals = {}
+        for url, next_due, interval in self.conn.execute(
+                'SELECT url, next_due, interval FROM schedule'):
+            self.intervals[url] = interval
+            self.heap.append((next_due, url))
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self, url):
+        # New urls are due immediately; known ones keep their schedule
+        if url in self.intervals:
+            return
+        now = time.time()
+        self.intervals[url] = self.interval
+        heapq.heappush(self.heap, (now, url))
+        self.conn.execute(
+            'INSERT OR IGNORE INTO schedule (url, next_due, interval) VALUES (?, ?, ?)',
+            (url, now, self.interval)
+        )
+        self._maybe_commit()
+
+    def add_all(self, urls):
+        for url in urls:
+            self.add(url)
+        self.commit()
+
+    def next_interval(self, url, changed, failed):
+        interval = self.intervals.get(url, self.interval)
+        if failed:
+            return interval, min(interval, self.retry_interval)
+        if changed:
+            interval /= 2
+        else:
+            interval *= 1.25
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        return interval, interval
+
+    def reschedule(self, url, changed=False, failed=False):
+        now = time.time()
+        interval, delay = self.next_interval(url, changed, failed)
+        # Jitter keeps urls added together from staying in lockstep
+        next_due = now + delay * random.uniform(0.9, 1.1)
+        self.intervals[url] = interval
+        heapq.heappush(self.heap, (next_due, url))
+        self.conn.execute(
+            'UPDATE schedule SET next_due = ?, interval = ?, checks = checks + 1, '
+            'changes = changes + ?, last_checked = ? WHERE url = ?',
+            (next_due, interval, int(changed), now, url)
+        )
+        self._maybe_commit()
+
+    def _maybe_commit(self):
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.uncommitted = 0
+
+    def next_due_in(self):
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - time.time())
+
+    def run(self, scrape, on_result, concurrency=8, timeout=10, duration=None):
+        # on_result(result) is called on this thread and returns whether the
+        # page changed. Runs until `duration` seconds have passed, or forever.
+        stop_at = time.monotonic() + duration if duration else None
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = {}
+            while stop_at is None or time.monotonic() < stop_at:
+                now = time.time()
+                while (len(pending) < concurrency and self.heap and self.heap[0][0] <= now
+                       and self.limiter.try_acquire()):
+                    _, url = heapq.heappop(self.heap)
+                    pending[pool.submit(scrape, url, timeout)] = url
+
+                # Sleep until the next url is due, a token is available or
+                # a fetch finishes, whichever comes first
+                wake = 1.0
+                if len(pending) < concurrency and self.heap:
+                    wake = min(wake, max(self.next_due_in(), self.limiter.wait_time()))
+                if not pending:
+                    time.sleep(wake)
+                    continue
+                done, _ = wait(pending, timeout=wake, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    result = future.result()
+                    changed = on_result(result)
+                    self.reschedule(url, changed=changed, failed=bool(result.get('error')))
+            for future in list(pending):
+                pending.pop(future).cancel()
+        self.commit()
+
+    def close(self):
+        self.commit()
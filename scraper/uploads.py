@@ -0,0 +1,189 @@
+import base64
+import codecs
+import json
+import re
+
+from .inputs import iter_rows
+from .normalize import DomainIndex
+from .web import get_header
+
+UPLOAD_TYPES = ('multipart/form-data', 'text/csv', 'text/plain', 'application/octet-stream')
+
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 64 * 1024
+MAX_PART_HEADERS = 16 * 1024
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+BOUNDARY_RE = re.compile(r'boundary="?([^";]+)"?', re.IGNORECASE)
+PARAM_RE = re.compile(r'\b(name|filename)="([^"]*)"', re.IGNORECASE)
+
+
+def iter_body_chunks(request, chunk_size=CHUNK_SIZE):
+    # The body may be a string, bytes, a file-like object or an iterable of
+    # byte chunks; large bodies are never copied as a whole
+    body = request.get('body') or b''
+    if request.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if isinstance(body, (bytes, bytearray)):
+        view = memoryview(body)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+    elif hasattr(body, 'read'):
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from body
+
+
+def iter_multipart_file(chunks, boundary, field='file'):
+    # Streams the body of the uploaded file part out of a multipart body.
+    # Only a tail of len(delimiter) bytes is ever held back between chunks.
+    delimiter = b'\r\n--' + boundary.encode('latin-1')
+    keep = len(delimiter)
+    buf = b'\r\n'
+    state = 'boundary'
+    wanted = False
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            if state == 'boundary':
+                idx = buf.find(delimiter)
+                if idx < 0:
+                    buf = buf[-keep:]
+                    break
+                buf = buf[idx + len(delimiter):]
+                state = 'after_boundary'
+            if state == 'after_boundary':
+                if len(buf) < 2:
+                    break
+                if buf.startswith(b'--'):
+                    return
+                state = 'headers'
+            if state == 'headers':
+                idx = buf.find(b'\r\n\r\n')
+                if idx < 0:
+                    if len(buf) > MAX_PART_HEADERS:
+                        raise ValueError('Malformed multipart body')
+                    break
+                wanted = is_file_part(buf[:idx].decode('latin-1'), field)
+                buf = buf[idx + 4:]
+                state = 'body'
+            if state == 'body':
+                idx = buf.find(delimiter)
+                if idx < 0:
+                    if wanted and len(buf) > keep:
+                        yield buf[:-keep]
+                    buf = buf[-keep:]
+                    break
+                if wanted:
+                    yield buf[:idx]
+                    return
+                buf = buf[idx + len(delimiter):]
+                state = 'after_boundary'
+
+
+def is_file_part(headers, field):
+    for line in headers.split('\r\n'):
+        if line.lower().startswith('content-disposition:'):
+            params = {key.lower(): value for key, value in PARAM_RE.findall(line)}
+            return params.get('name') == field or 'filename' in params
+    return False
+
+
+def detect_encoding(sample):
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        match = from_bytes(sample).best()
+        if match is not None:
+            return match.encoding
+    except ImportError:
+        pass
+    return 'cp1252'
+
+
+def iter_text(chunks):
+    # Encoding is detected from the first SNIFF_BYTES of the stream
+    chunks = iter(chunks)
+    head = []
+    size = 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= SNIFF_BYTES:
+            break
+    sample = b''.join(head)
+    decoder = codecs.getincrementaldecoder(detect_encoding(sample))(errors='replace')
+    yield decoder.decode(sample)
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_lines(text_chunks):
+    pending = ''
+    for text in text_chunks:
+        pending += text
+        lines = pending.splitlines(keepends=True)
+        if lines and not lines[-1].endswith(('\n', '\r')):
+            pending = lines.pop()
+        else:
+            pending = ''
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_upload_rows(request):
+    # (line number, domain) pairs from a multipart upload or a raw CSV body
+    chunks = iter_body_chunks(request)
+    content_type = get_header(request, 'content-type')
+    if content_type.lower().startswith('multipart/form-data'):
+        match = BOUNDARY_RE.search(content_type)
+        if not match:
+            raise ValueError('Missing multipart boundary')
+        chunks = iter_multipart_file(chunks, match.group(1))
+    return iter_rows(iter_lines(iter_text(chunks)))
+
+
+def index_from_request(request):
+    # Canonicalise and drop duplicates before fetching anything
+    index = DomainIndex()
+
+    content_type = get_header(request, 'content-type').lower()
+    if content_type.startswith(UPLOAD_TYPES):
+        # CSV upload: rows are parsed as the body streams in
+        index.add_all(iter_upload_rows(request))
+        return index
+
+    # JSON body with newline-separated urls
+    body = request.get('body', '{}')
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    if isinstance(body, str):
+        data = json.loads(body)
+    else:
+        data = body
+
+    urls_text = data.get('urls', '').strip()
+    urls = [url.strip() for url in urls_text.split('\n') if url.strip()]
+    for row, url in enumerate(urls, 1):
+        index.add(url, row)
+    return index
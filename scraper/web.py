@@ -0,0 +1,82 @@
+import hashlib
+import importlib.util
+import json
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Edge caching of GET responses: fresh for CACHE_S_MAXAGE seconds, then
+# served stale for up to CACHE_SWR seconds while the CDN revalidates
+CACHE_S_MAXAGE = int(os.environ.get('SCRAPE_CACHE_S_MAXAGE', 3600))
+CACHE_SWR = int(os.environ.get('SCRAPE_CACHE_SWR', 86400))
+
+
+def get_header(request, name):
+    headers = request.get('headers') or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return ''
+
+
+def get_query(request):
+    query = request.get('query')
+    if query is None:
+        query = dict(parse_qsl(urlsplit(request.get('path') or request.get('url') or '').query))
+    # Multi-valued parameters keep their first value
+    return {key: value[0] if isinstance(value, list) else value for key, value in query.items()}
+
+
+def load_routes(root=ROOT):
+    # (src, dest) pairs from vercel.json
+    with open(os.path.join(root, 'vercel.json')) as f:
+        return [(route['src'], route['dest']) for route in json.load(f)['routes']]
+
+
+def load_handler(dest, root=ROOT):
+    # Handlers are imported once per process, so their module-level state
+    # stays warm across requests
+    name = 'api_' + os.path.splitext(os.path.basename(dest))[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(root, dest.lstrip('/')))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def etag_for(body):
+    return '"%s"' % hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def cacheable_json_response(request, payload, s_maxage=CACHE_S_MAXAGE, swr=CACHE_SWR):
+    # The body is a pure function of the payload, so its hash is a valid
+    # strong ETag; a matching If-None-Match gets an empty 304
+    body = json.dumps(payload, sort_keys=True)
+    etag = etag_for(body)
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Cache-Control': f'public, max-age=0, s-maxage={s_maxage}, stale-while-revalidate={swr}',
+        'ETag': etag
+    }
+    if etag_matches(get_header(request, 'if-none-match'), etag):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    return {'statusCode': 200, 'headers': headers, 'body': body}
+
+
+def cacheable_result(pricing_data):
+    # Per-request fields are left out so identical extractions give
+    # byte-identical bodies
+    data = {key: value for key, value in pricing_data.items() if key != 'timestamp'}
+    return {'success': True, 'data': data, 'error': None}
@@ -0,0 +1,100 @@
+import math
+import multiprocessing
+import os
+import socket
+import time
+
+from .engine import scrape_many, shared_scrape
+from .jobs import IN_FLIGHT, PENDING, JobStore
+
+VISIBILITY_TIMEOUT = 120.0
+IDLE_SLEEP = 2.0
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_worker(db_path, job_id, concurrency=16, timeout=10, batch_size=None,
+               visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=3, stop=None):
+    # Leases batches of domains, scrapes them and commits the results under
+    # the lease. Exits when the job has nothing pending or in flight, or
+    # when `stop` (a multiprocessing.Event) is set between batches.
+    me = worker_id()
+    store = JobStore(db_path)
+    batch_size = batch_size or concurrency * 4
+    scrape = shared_scrape()
+    try:
+        while stop is None or not stop.is_set():
+            rows = store.lease(job_id, me, batch_size, visibility_timeout, max_attempts)
+            if not rows:
+                counts = store.counts(job_id)
+                if not counts[IN_FLIGHT] and not counts[PENDING]:
+                    return
+                # Others still hold leases; pick up their work if they die
+                time.sleep(IDLE_SLEEP)
+                continue
+
+            seq_of = {url: seq for seq, url in rows}
+            held = set(seq_of.values())
+            renewed = time.monotonic()
+            done = []
+            for result in scrape_many(seq_of, concurrency=concurrency, timeout=timeout,
+                                      scrape=scrape):
+                seq = seq_of[result['url']]
+                held.discard(seq)
+                done.append((seq, result))
+                # Renew well before the visibility timeout runs out
+                if time.monotonic() - renewed > visibility_timeout / 3:
+                    store.complete(me, done, max_attempts)
+                    done = []
+                    store.renew(me, held, visibility_timeout)
+                    renewed = time.monotonic()
+            store.complete(me, done, max_attempts)
+    finally:
+        store.close()
+
+
+def desired_workers(remaining, min_workers, max_workers, urls_per_worker):
+    return max(min_workers, min(max_workers, math.ceil(remaining / urls_per_worker)))
+
+
+def run_fleet(db_path, job_id, max_workers=4, min_workers=1, urls_per_worker=500,
+              concurrency=16, timeout=10, poll_interval=2.0, on_poll=None):
+    # Runs worker processes against the job and scales their number with
+    # the queue depth: one per urls_per_worker remaining domains, between
+    # min_workers and max_workers. Surplus workers are asked to stop after
+    # their current batch. Returns when the job is finished.
+    store = JobStore(db_path)
+    workers = []
+    try:
+        while True:
+            workers = [(p, stop) for p, stop in workers if p.is_alive()]
+            counts = store.counts(job_id)
+            remaining = counts[PENDING] + counts[IN_FLIGHT]
+            if on_poll:
+                on_poll(counts, len(workers))
+            if not remaining and not workers:
+                return counts
+
+            active = [(p, stop) for p, stop in workers if not stop.is_set()]
+            want = desired_workers(remaining, min_workers, max_workers, urls_per_worker)
+            want = min(want, remaining)
+            for _ in range(want - len(active)):
+                stop = multiprocessing.Event()
+                p = multiprocessing.Process(
+                    target=run_worker, args=(db_path, job_id),
+                    kwargs={'concurrency': concurrency, 'timeout': timeout, 'stop': stop},
+                    daemon=True
+                )
+                p.start()
+                workers.append((p, stop))
+            for p, stop in active[want:]:
+                stop.set()
+            time.sleep(poll_interval)
+    finally:
+        for p, stop in workers:
+            stop.set()
+        for p, _ in workers:
+            p.join()
+        store.close()
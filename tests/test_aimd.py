@@ -0,0 +1,66 @@
+from scraper.aimd import AIMD, ConcurrencyLimiter
+
+
+def test_aimd_grows_by_one_per_window_of_successes():
+    limit = AIMD(4, maximum=10)
+    for _ in range(4):
+        limit.success()
+    assert limit.limit == 4
+    for _ in range(5):
+        limit.success()
+    assert limit.limit == 5
+
+
+def test_aimd_halves_once_per_burst_of_overloads():
+    limit = AIMD(8, maximum=8)
+    assert limit.overload()
+    assert limit.limit == 4
+    # Requests already in flight time out too; they count once
+    assert not any(limit.overload() for _ in range(3))
+    assert limit.limit == 4
+    assert limit.overload()
+    assert limit.limit == 2
+
+
+def test_aimd_stays_within_bounds():
+    limit = AIMD(2, minimum=1, maximum=3)
+    for _ in range(100):
+        limit.success()
+    assert limit.limit == 3
+    for _ in range(100):
+        limit.overload()
+    assert limit.limit == 1
+
+
+def test_host_limit_caps_inflight_per_host():
+    limiter = ConcurrencyLimiter(initial=10, maximum=10, host_initial=2)
+    assert limiter.acquire('https://a.com/1')
+    assert limiter.acquire('https://a.com/2')
+    assert not limiter.acquire('https://a.com/3')
+    assert limiter.acquire('https://b.com/1')
+    limiter.release('https://a.com/1')
+    assert limiter.acquire('https://a.com/3')
+
+
+def test_host_timeouts_shrink_that_host():
+    limiter = ConcurrencyLimiter(initial=16, maximum=16, host_initial=2)
+    for i in range(20):
+        # One slow host among many healthy ones
+        url = 'https://slow.com/' if i % 10 == 0 else f'https://fast{i}.com/'
+        assert limiter.acquire(url)
+        limiter.release(url, 10.0, 'Read timed out' if url == 'https://slow.com/' else None)
+    assert limiter.hosts['slow.com'][0].limit == 1
+    assert limiter.limit == 16
+    assert limiter.acquire('https://slow.com/')
+    assert not limiter.acquire('https://slow.com/')
+    assert limiter.acquire('https://fast.com/')
+    assert limiter.acquire('https://fast.com/')
+
+
+def test_skipped_hosts_are_not_overload():
+    limiter = ConcurrencyLimiter(initial=4, maximum=4, host_initial=2)
+    error = 'Read timed out (skipped: slow.com is failing, retry in 60s)'
+    for _ in range(4):
+        assert limiter.acquire('https://slow.com/')
+        limiter.release('https://slow.com/', 0.0, error)
+    assert limiter.metrics()['overloaded'] == 0
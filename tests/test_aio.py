@@ -0,0 +1,50 @@
+import asyncio
+import zlib
+
+import pytest
+
+from scraper.aio import FetchError, read_body
+
+
+def read(parts, headers, max_bytes=10000):
+    async def run():
+        reader = asyncio.StreamReader()
+
+        async def feed():
+            for part in parts:
+                await asyncio.sleep(0.01)
+                reader.feed_data(part)
+            reader.feed_eof()
+
+        feeding = asyncio.ensure_future(feed())
+        try:
+            return await read_body(reader, 200, headers, max_bytes)
+        finally:
+            await feeding
+
+    return asyncio.run(run())
+
+
+def test_body_until_eof_is_read_whole():
+    assert read([b'a' * 1000, b'b' * 1000], {}) == b'a' * 1000 + b'b' * 1000
+
+
+def test_body_until_eof_is_limited():
+    with pytest.raises(FetchError):
+        read([b'a' * 1000, b'b' * 1000], {}, max_bytes=1500)
+
+
+def test_content_length_body():
+    assert read([b'abc', b'def'], {'content-length': '6'}) == b'abcdef'
+
+
+def test_gzip_body_is_decoded():
+    encoder = zlib.compressobj(wbits=31)
+    body = encoder.compress(b'pricing' * 100) + encoder.flush()
+    assert read([body], {'content-encoding': 'gzip'}) == b'pricing' * 100
+
+
+def test_decoded_body_is_limited():
+    bomb = zlib.compress(b'\0' * 1000000)
+    with pytest.raises(FetchError):
+        read([bomb], {'content-encoding': 'deflate'}, max_bytes=10000)
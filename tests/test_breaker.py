@@ -0,0 +1,105 @@
+import socket
+import ssl
+
+import pytest
+import requests
+
+from scraper.breaker import (BLOCKED, CHALLENGED, DNS, PROBE_WINDOW, REFUSED, TIMEOUT, TLS,
+                             Blocked, Challenged, HostBreaker, HostUnavailable, classify,
+                             error_kind)
+
+URL = 'https://down.example.com/pricing'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker():
+    clock = Clock()
+    return HostBreaker(clock=clock), clock
+
+
+def wrapped(error):
+    # requests' nesting: ConnectionError -> ... -> the socket error
+    try:
+        try:
+            raise error
+        except Exception as e:
+            raise requests.ConnectionError(e)
+    except requests.ConnectionError as e:
+        return e
+
+
+@pytest.mark.parametrize('error, kind', [
+    (wrapped(socket.gaierror(-2, 'Name or service not known')), DNS),
+    (wrapped(ConnectionRefusedError(111, 'Connection refused')), REFUSED),
+    (wrapped(ssl.SSLCertVerificationError('certificate verify failed')), TLS),
+    (requests.exceptions.ReadTimeout('Read timed out'), TIMEOUT),
+    (requests.ConnectionError('Failed to resolve host'), DNS),
+    (Blocked('HTTP 403'), BLOCKED),
+    (Challenged('Bot challenge from Cloudflare (HTTP 403)'), CHALLENGED),
+    (ValueError('No pricing found'), None),
+])
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+def test_error_kind_ignores_volatile_parts():
+    assert error_kind('Connection refused') == REFUSED
+    first = 'boom at 0x7f00aa (skipped: a.com is failing, retry in 30s)'
+    assert error_kind(first) == error_kind('boom at 0x7f00bb') == 'boom'
+    assert error_kind('') is None
+
+
+def test_backoff_doubles_up_to_the_cap():
+    breaker, clock = make_breaker()
+    error = ConnectionRefusedError('Connection refused')
+    delays = []
+    for _ in range(10):
+        breaker.failure(URL, error)
+        delays.append(breaker.hosts['down.example.com']['open_until'] - clock.now)
+    assert delays[:3] == [120, 240, 480]
+    assert delays[-1] == breaker.max_backoff
+
+
+def test_timeouts_open_the_circuit_on_the_second_failure():
+    breaker, _ = make_breaker()
+    error = requests.exceptions.ReadTimeout('Read timed out')
+    breaker.failure(URL, error)
+    assert breaker.check(URL) is None
+    breaker.failure(URL, error)
+    assert 'retry in 60s' in breaker.check(URL)
+
+
+def test_open_circuit_lets_one_probe_through():
+    breaker, clock = make_breaker()
+    breaker.failure(URL, ConnectionRefusedError('Connection refused'))
+    assert breaker.check(URL).startswith('Connection refused (skipped: down.example.com')
+    # Other ports of the host are not affected
+    assert breaker.check('https://down.example.com:8443/') is None
+
+    clock.now = 120
+    assert breaker.check(URL) is None
+    assert 'retry in %ds' % PROBE_WINDOW in breaker.check(URL)
+    breaker.success(URL)
+    assert breaker.check(URL) is None
+
+
+def test_attempt():
+    breaker, _ = make_breaker()
+    with pytest.raises(ValueError):
+        with breaker.attempt(URL):
+            raise ValueError('not a host failure')
+    assert breaker.check(URL) is None
+
+    with pytest.raises(Blocked):
+        with breaker.attempt(URL):
+            raise Blocked('HTTP 429')
+    with pytest.raises(HostUnavailable, match='HTTP 429'):
+        with breaker.attempt(URL):
+            pass
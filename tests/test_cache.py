@@ -0,0 +1,136 @@
+import threading
+
+import pytest
+
+from scraper.cache import FRESH, MISS, STALE, ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache():
+    clock = Clock()
+    return ResultCache(soft_ttl=10, hard_ttl=100, clock=clock), clock
+
+
+def loader(*values):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return values[len(calls) - 1]
+    return load, calls
+
+
+def settle(cache):
+    # Waits for background refreshes; the next one starts a new pool
+    cache.pool.shutdown(wait=True)
+    cache._pool = None
+
+
+def test_fresh_result_is_served_from_cache():
+    cache, clock = make_cache()
+    load, calls = loader('a')
+    assert cache.get('k', load) == 'a'
+    clock.now = 9
+    assert cache.get('k', load) == 'a'
+    assert len(calls) == 1
+    assert cache.stats == {FRESH: 1, STALE: 0, MISS: 1}
+
+
+def test_stale_result_is_served_while_refreshing():
+    cache, clock = make_cache()
+    load, calls = loader('a', 'b')
+    cache.get('k', load)
+    clock.now = 50
+    assert cache.get('k', load) == 'a'
+    settle(cache)
+    assert len(calls) == 2
+    assert cache.get('k', load) == 'b'
+    assert cache.stats[STALE] == 1
+
+
+def test_past_hard_ttl_waits_for_a_fresh_load():
+    cache, clock = make_cache()
+    load, calls = loader('a', 'b')
+    cache.get('k', load)
+    clock.now = 100
+    assert cache.get('k', load) == 'b'
+    assert cache.stats[MISS] == 2
+
+
+def test_failed_refresh_keeps_the_stale_value():
+    cache, clock = make_cache()
+    cache.get('k', lambda: 'a')
+    clock.now = 50
+
+    def fail():
+        raise RuntimeError('down')
+
+    assert cache.get('k', fail) == 'a'
+    settle(cache)
+    assert cache.get('k', fail) == 'a'
+    assert not cache.inflight
+
+
+def test_failed_load_is_not_cached():
+    cache, _ = make_cache()
+
+    def fail():
+        raise RuntimeError('down')
+
+    with pytest.raises(RuntimeError):
+        cache.get('k', fail)
+    assert cache.get('k', lambda: 'a') == 'a'
+
+
+def test_concurrent_misses_share_one_load():
+    cache, _ = make_cache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'a'
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get('k', load)))
+    owner.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get('k', load)))
+               for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+    assert results == ['a'] * 4
+    assert len(calls) == 1
+
+
+def test_stale_key_is_refreshed_once_at_a_time():
+    cache, clock = make_cache()
+    cache.get('k', lambda: 'a')
+    clock.now = 50
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return 'b'
+
+    try:
+        assert [cache.get('k', load) for _ in range(3)] == ['a'] * 3
+    finally:
+        release.set()
+    settle(cache)
+    assert len(calls) == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from scraper.breaker import Blocked, Challenged
+from scraper.challenge import SCAN_BYTES, check_response, detect
+
+PAGE = b'<html><head><title>Pricing</title></head><body>Plans from $9</body></html>'
+CF_ERROR = b'<html><body><div id="cf-error-details">Error 522</div></body></html>'
+
+
+def test_header_signatures():
+    assert detect({'cf-mitigated': 'Challenge'}, PAGE) == 'Cloudflare'
+    assert detect({'x-amzn-waf-action': ''}, PAGE) == 'AWS WAF'
+    assert detect({'cf-mitigated': 'other'}, PAGE) is None
+
+
+@pytest.mark.parametrize('body, vendor', [
+    (b'<html><head><TITLE>Just a moment...</TITLE>', 'Cloudflare'),
+    (b'<script src="https://geo.captcha-delivery.com/c.js"></script>', 'DataDome'),
+    (b'<html><head><title>Checking your browser</title>', 'bot wall'),
+    (PAGE, None),
+])
+def test_body_signatures(body, vendor):
+    assert detect({}, body, 200) == vendor
+
+
+def test_only_the_start_of_the_body_is_scanned():
+    body = b' ' * SCAN_BYTES + b'<title>just a moment...</title>'
+    assert detect({}, body) is None
+
+
+def test_cf_error_details_is_a_wall_only_on_403():
+    assert detect({}, CF_ERROR, 403) == 'Cloudflare'
+    assert detect({}, CF_ERROR, 522) is None
+    assert detect({}, CF_ERROR) is None
+
+
+def test_check_response():
+    with pytest.raises(Challenged, match='Cloudflare \\(HTTP 403\\)'):
+        check_response(403, {}, CF_ERROR)
+    with pytest.raises(Blocked):
+        check_response(429, {}, PAGE)
+    check_response(200, {}, PAGE)
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from scraper.engine import scrape_by_host
+
+# IP literals resolve without a network
+HOSTS = ['127.0.0.1', '127.0.0.2', '127.0.0.3']
+
+
+def urls(count, hosts=HOSTS):
+    return [f'http://{hosts[i % len(hosts)]}:9/page{i}' for i in range(count)]
+
+
+def fake_scrape(delays=None):
+    def scrape(url, timeout, **kwargs):
+        time.sleep((delays or {}).get(url, 0))
+        return {'url': url}
+    return scrape
+
+
+def test_results_come_out_in_input_order():
+    inputs = urls(30)
+    # Early urls finish last
+    delays = {url: 0.002 * (30 - i) for i, url in enumerate(inputs)}
+    results = scrape_by_host(inputs, concurrency=4, scrape=fake_scrape(delays), window=8)
+    assert [result['url'] for result in results] == inputs
+
+
+def test_unordered_results_come_out_as_they_finish():
+    inputs = urls(2, hosts=HOSTS[:2])
+    delays = {inputs[0]: 0.3}
+    results = scrape_by_host(inputs, concurrency=2, scrape=fake_scrape(delays), ordered=False)
+    assert [result['url'] for result in results] == inputs[::-1]
+
+
+def test_every_url_is_scraped_once():
+    inputs = urls(100)
+    seen = []
+    lock = threading.Lock()
+
+    def scrape(url, timeout, **kwargs):
+        with lock:
+            seen.append(url)
+        return {'url': url}
+
+    results = list(scrape_by_host(inputs, concurrency=3, scrape=scrape, window=16,
+                                  ordered=False))
+    assert sorted(result['url'] for result in results) == sorted(inputs)
+    assert sorted(seen) == sorted(inputs)
+
+
+def test_results_are_yielded_before_their_lane_finishes():
+    # Both urls are on one host, so one lane fetches them back to back; the
+    # first result must be out while the second is still running
+    first, second = urls(2, hosts=HOSTS[:1])
+    release = threading.Event()
+    finished = threading.Event()
+
+    def scrape(url, timeout, **kwargs):
+        if url == second:
+            release.wait(5)
+            finished.set()
+        return {'url': url}
+
+    results = scrape_by_host([first, second], concurrency=2, scrape=scrape, lanes_per_host=1)
+    try:
+        assert next(results)['url'] == first
+        assert not finished.is_set()
+    finally:
+        release.set()
+    assert [result['url'] for result in results] == [second]
+
+
+def test_lane_errors_are_raised():
+    def scrape(url, timeout, **kwargs):
+        raise KeyError(url)
+
+    with pytest.raises(KeyError):
+        list(scrape_by_host(urls(1), scrape=scrape))
@@ -0,0 +1,58 @@
+import pytest
+
+from scraper.fingerprints import (PARKING_SAMPLES, NotPricing, check_content, distance,
+                                 page_simhash, simhash)
+
+NOT_FOUND_PAGE = (b'<html><body><h1>Page not found</h1><p>Sorry, the page you were looking for '
+                  b'does not exist. It may have been moved or deleted. Go back to the home page '
+                  b'or search our documentation, blog and customer stories.</p></body></html>')
+PRICING_PAGE = (b'<html><body><h1>Pricing</h1><p>Choose the plan that fits your team. Free for '
+                b'individuals, Plus for small teams with unlimited blocks and file uploads, '
+                b'Business for companies that need single sign on and advanced permissions. '
+                b'Enterprise adds audit logs, workspace analytics and dedicated support.</p>'
+                b'</body></html>')
+
+
+def known(value):
+    calls = []
+
+    def get():
+        calls.append(1)
+        return value
+    return get, calls
+
+
+def test_not_found_statuses():
+    for status in (404, 410):
+        with pytest.raises(NotPricing, match=f'HTTP {status}'):
+            check_content(status, 'https://a.com/pricing', PRICING_PAGE, known(None)[0])
+
+
+def test_parked_domain():
+    page = f'<html><body>{PARKING_SAMPLES[2].replace("example.com", "acme.io")}</body></html>'
+    with pytest.raises(NotPricing, match='Parked'):
+        check_content(200, 'https://acme.io/', page.encode(), known(None)[0])
+
+
+def test_soft_404_matches_the_hosts_not_found_page():
+    fingerprint = page_simhash(NOT_FOUND_PAGE)
+    get, calls = known(fingerprint)
+    with pytest.raises(NotPricing, match='Soft 404'):
+        check_content(200, 'https://a.com/pricing', NOT_FOUND_PAGE, get)
+    check_content(200, 'https://a.com/pricing', PRICING_PAGE, get)
+    assert len(calls) == 2
+
+
+def test_root_and_non_200_pages_are_not_probed():
+    get, calls = known(page_simhash(NOT_FOUND_PAGE))
+    check_content(200, 'https://a.com/', NOT_FOUND_PAGE, get)
+    check_content(203, 'https://a.com/pricing', NOT_FOUND_PAGE, get)
+    assert calls == []
+
+
+def test_simhash_distance():
+    page = page_simhash(PRICING_PAGE)
+    edited = page_simhash(PRICING_PAGE.replace(b'Enterprise', b'Enterprise plan'))
+    assert distance(page, edited) <= 8
+    assert distance(page, page_simhash(NOT_FOUND_PAGE)) > 8
+    assert simhash('too few words here') is None
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from scraper import fetch as fetch_module
+from scraper import hedge
+from scraper.hedge import HedgeBudget, hedged_fetch
+from scraper.latency import LatencyTracker
+
+URL = 'https://slow.example.com/pricing'
+
+
+@pytest.fixture
+def latency(monkeypatch):
+    tracker = LatencyTracker()
+    monkeypatch.setattr(hedge, 'LATENCY', tracker)
+    monkeypatch.setattr('scraper.latency.LATENCY', tracker)
+    return tracker
+
+
+def learnt(tracker, ttfb):
+    for _ in range(5):
+        tracker.record(URL, ttfb, ttfb)
+
+
+def test_fast_failure_is_raised_without_waiting_for_the_hedge(monkeypatch, latency):
+    learnt(latency, 2.0)
+
+    def fetch(url, **kwargs):
+        raise ConnectionRefusedError('Connection refused')
+
+    monkeypatch.setattr(hedge, 'fetch', fetch)
+    budget = HedgeBudget(ratio=1, burst=10)
+    started = time.monotonic()
+    with pytest.raises(ConnectionRefusedError):
+        hedged_fetch(URL, budget=budget)
+    assert time.monotonic() - started < 1
+    assert budget.stats['hedges'] == 0
+
+
+def test_hedge_wins_when_the_first_attempt_stalls(monkeypatch, latency):
+    learnt(latency, 0.05)
+    release = threading.Event()
+    calls = []
+
+    class Response:
+        def close(self):
+            pass
+
+    def fetch(url, on_headers=None, cancelled=None, **kwargs):
+        calls.append(cancelled)
+        if len(calls) == 1:
+            release.wait(5)
+            raise requests.Timeout('Read timed out')
+        response = Response()
+        on_headers(response)
+        return response
+
+    monkeypatch.setattr(hedge, 'fetch', fetch)
+    budget = HedgeBudget(ratio=1, burst=10)
+    try:
+        assert isinstance(hedged_fetch(URL, budget=budget), Response)
+        assert budget.stats['hedge_wins'] == 1
+        # The stalled attempt is told nobody is waiting for it
+        assert calls[0].is_set()
+    finally:
+        release.set()
+
+
+def test_cancelled_fetch_records_nothing(monkeypatch, latency):
+    class Session:
+        def get(self, url, **kwargs):
+            raise requests.exceptions.ReadTimeout('Read timed out')
+
+    monkeypatch.setattr(fetch_module, 'get_session', lambda: Session())
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        fetch_module.fetch(URL, cancelled=cancelled)
+    assert URL.split('/')[2] not in latency.hosts
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        fetch_module.fetch(URL)
+    assert latency.hosts[URL.split('/')[2]]['backoff'] == 2
@@ -0,0 +1,76 @@
+import json
+
+from scraper.jobs import DONE, FAILED, IN_FLIGHT, PENDING, JobStore
+
+URLS = ['https://a.com', 'https://b.com', 'https://c.com']
+
+
+def make_store(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    store.create_job('job', URLS)
+    return store
+
+
+def test_lease_hands_each_domain_to_one_worker(tmp_path):
+    store = make_store(tmp_path)
+    first = store.lease('job', 'w1', 2)
+    second = store.lease('job', 'w2', 2)
+    assert [url for _, url in first] == URLS[:2]
+    assert [url for _, url in second] == URLS[2:]
+    assert store.lease('job', 'w3', 2) == []
+    assert store.counts('job')[IN_FLIGHT] == 3
+
+
+def test_complete_commits_results_of_held_leases(tmp_path):
+    store = make_store(tmp_path)
+    leased = store.lease('job', 'w1', 3)
+    items = [(seq, {'url': url, 'price': '$1'}) for seq, url in leased]
+    assert store.complete('w1', items) == 3
+    assert store.counts('job')[DONE] == 3
+    assert [result['url'] for result in store.iter_results('job')] == URLS
+
+
+def test_lost_lease_result_is_discarded(tmp_path):
+    store = make_store(tmp_path)
+    # w1's lease runs out at once, so w2 can take the same domains over
+    leased = store.lease('job', 'w1', 3, visibility_timeout=-1)
+    retaken = store.lease('job', 'w2', 3)
+    assert [seq for seq, _ in retaken] == [seq for seq, _ in leased]
+
+    late = [(seq, {'url': url, 'price': 'stale'}) for seq, url in leased]
+    assert store.complete('w1', late) == 0
+    fresh = [(seq, {'url': url, 'price': '$2'}) for seq, url in retaken]
+    assert store.complete('w2', fresh) == 3
+    assert {result['price'] for result in store.iter_results('job')} == {'$2'}
+    # Nothing is committed twice, even when the old owner tries again
+    assert store.complete('w1', late) == 0
+
+
+def test_expired_lease_is_given_up_after_max_attempts(tmp_path):
+    store = make_store(tmp_path)
+    for _ in range(3):
+        assert len(store.lease('job', 'w1', 3, visibility_timeout=-1, max_attempts=3)) == 3
+    assert store.lease('job', 'w1', 3, max_attempts=3) == []
+    assert store.counts('job')[FAILED] == 3
+    row = store.conn.execute('SELECT result FROM job_domains LIMIT 1').fetchone()
+    assert json.loads(row[0]) == {'error': 'Lease expired too often'}
+
+
+def test_failure_is_retried_until_max_attempts(tmp_path):
+    store = make_store(tmp_path)
+    for attempt in range(1, 4):
+        leased = store.lease('job', 'w1', 1, max_attempts=3)
+        assert [url for _, url in leased] == URLS[:1]
+        seq = leased[0][0]
+        assert store.complete('w1', [(seq, {'url': URLS[0], 'error': 'boom'})],
+                              max_attempts=3) == 1
+        state = store.conn.execute('SELECT state FROM job_domains WHERE seq = ?',
+                                   (seq,)).fetchone()[0]
+        assert state == (PENDING if attempt < 3 else FAILED)
+
+
+def test_create_job_reports_whether_the_job_is_new(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.db'))
+    assert store.create_job('job', URLS)
+    assert not store.create_job('job', URLS + ['https://d.com'])
+    assert sum(store.counts('job').values()) == 4
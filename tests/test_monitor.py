@@ -0,0 +1,65 @@
+from scraper.monitor import Monitor
+from scraper.results import ResultStore
+
+URL = 'https://notion.so/pricing'
+
+
+def result(**fields):
+    return dict({'url': URL, 'plan_name': 'Plus', 'price': '$10', 'billing_period': 'month',
+                 'features': ['Unlimited pages'], 'error': None, 'content_hash': 'aaa',
+                 'timestamp': '2026-01-01T00:00:00'}, **fields)
+
+
+def make_monitor(tmp_path):
+    return Monitor(ResultStore(str(tmp_path / 'results.db')))
+
+
+def test_first_result_is_new(tmp_path):
+    monitor = make_monitor(tmp_path)
+    stored, change = monitor.record(result())
+    assert change['status'] == 'new'
+    assert change['changes']['price'] == [None, '$10']
+    assert 'error' not in change['changes']
+    assert monitor.known[URL] == 'aaa'
+
+
+def test_unchanged_page_carries_the_previous_result_forward(tmp_path):
+    monitor = make_monitor(tmp_path)
+    monitor.record(result())
+    stored, change = monitor.record({'url': URL, 'content_hash': 'aaa', 'unchanged': True})
+    assert change is None
+    assert stored['price'] == '$10'
+    assert stored['timestamp'] != '2026-01-01T00:00:00'
+    assert monitor.store.latest_for_url(URL)['price'] == '$10'
+
+
+def test_changed_fields_are_reported(tmp_path):
+    monitor = make_monitor(tmp_path)
+    monitor.record(result())
+    stored, change = monitor.record(result(price='$12', content_hash='bbb'))
+    assert change['status'] == 'changed'
+    assert change['changes'] == {'price': ['$10', '$12']}
+    assert monitor.known[URL] == 'bbb'
+
+
+def test_same_content_under_a_new_hash_is_not_a_change(tmp_path):
+    monitor = make_monitor(tmp_path)
+    monitor.record(result())
+    assert monitor.record(result(content_hash='bbb'))[1] is None
+
+
+def test_repeated_failure_is_not_a_change(tmp_path):
+    monitor = make_monitor(tmp_path)
+    refused = ("HTTPSConnectionPool(host='notion.so', port=443): Max retries exceeded "
+               "(Caused by NewConnectionError('<urllib3.connection.HTTPSConnection object "
+               "at 0x7f3a2c1d0>: Failed to establish a new connection: [Errno 111] "
+               "Connection refused'))")
+    failed = dict(result(), plan_name='', price='', billing_period='', features=[],
+                  content_hash=None)
+    monitor.record(dict(failed, error=refused))
+    again = refused.replace('0x7f3a2c1d0', '0x7f99e0b10') + (
+        ' (skipped: notion.so is failing, retry in 97s)')
+    assert monitor.record(dict(failed, error=again))[1] is None
+
+    stored, change = monitor.record(dict(failed, error='HTTP 404'))
+    assert change['changes'] == {'error': [again, 'HTTP 404']}
@@ -0,0 +1,89 @@
+import pytest
+
+from scraper.normalize import DomainIndex, canonicalize
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('notion.so', 'https://notion.so'),
+    ('  NOTION.SO  ', 'https://notion.so'),
+    ('https://Notion.so/Pricing', 'https://notion.so/Pricing'),
+    ('http://notion.so', 'http://notion.so'),
+    ('www.notion.so', 'https://notion.so'),
+    # A bare www.tld is a name in its own right
+    ('www.io', 'https://www.io'),
+    ('notion.so/pricing/', 'https://notion.so/pricing'),
+    ('notion.so.', 'https://notion.so'),
+    ('https://notion.so:443/', 'https://notion.so'),
+    ('http://notion.so:80', 'http://notion.so'),
+    ('https://notion.so:8443', 'https://notion.so:8443'),
+    ('notion.so/pricing?utm_source=x&plan=pro&gclid=1&UTM_MEDIUM=y',
+     'https://notion.so/pricing?plan=pro'),
+    ('notion.so/?ref=hn#plans', 'https://notion.so'),
+    ('localhost:8000', 'https://localhost:8000'),
+])
+def test_canonicalize(raw, expected):
+    assert canonicalize(raw) == expected
+
+
+def test_canonicalize_policy_flags():
+    url = 'www.notion.so/pricing/'
+    assert canonicalize(url, strip_www=False) == 'https://www.notion.so/pricing'
+    assert canonicalize(url, strip_trailing_slash=False) == 'https://notion.so/pricing/'
+
+
+@pytest.mark.parametrize('raw, expected', [
+    # IDNA2008: ß and ς are kept, not mapped to ss and σ as IDNA2003 does
+    ('straße.de', 'https://xn--strae-oqa.de'),
+    ('FAß.de', 'https://xn--fa-hia.de'),
+    ('www.Bücher.de/', 'https://xn--bcher-kva.de'),
+    ('xn--strae-oqa.de', 'https://xn--strae-oqa.de'),
+])
+def test_canonicalize_idn(raw, expected):
+    assert canonicalize(raw) == expected
+
+
+@pytest.mark.parametrize('raw', [
+    '', '   ', 'notion', 'ftp://notion.so', 'not a domain.com',
+    'https://notion.so:99999', 'a..com', '☃.com',
+])
+def test_canonicalize_rejects(raw):
+    assert canonicalize(raw) is None
+
+
+def test_domain_index_deduplicates_and_fans_out():
+    index = DomainIndex().add_all([
+        (1, 'www.Example.com'), (2, 'example.com/'), (3, 'https://example.com?utm_source=x'),
+        (4, 'foo.io'), (5, 'ftp://bad.com'), (6, 'nonsense'),
+    ])
+    # Fetched in the form the first row gave
+    assert list(index.urls()) == ['https://www.example.com', 'https://foo.io']
+    assert index.total == 6
+    assert index.duplicates == 2
+
+    rows = list(index.expand({'url': 'https://www.example.com', 'price': '$1'}))
+    assert [(row['row'], row['input']) for row in rows] == [
+        (1, 'www.Example.com'), (2, 'example.com/'), (3, 'https://example.com?utm_source=x'),
+    ]
+    assert {row['price'] for row in rows} == {'$1'}
+
+    invalid = list(index.invalid_results())
+    assert [(row['row'], row['error']) for row in invalid] == [
+        (5, 'Invalid domain'), (6, 'Invalid domain'),
+    ]
+
+
+def test_domain_index_add_returns_new_urls_only():
+    index = DomainIndex()
+    assert index.add('example.com') == 'https://example.com'
+    assert index.add('www.example.com') is None
+    assert index.add('nonsense') is None
+
+
+def test_domain_index_keep_www():
+    index = DomainIndex(strip_www=False).add_all([(1, 'www.example.com'), (2, 'example.com')])
+    assert list(index.urls()) == ['https://www.example.com', 'https://example.com']
+
+
+def test_unknown_result_url_expands_to_itself():
+    rows = list(DomainIndex().expand({'url': 'https://other.com'}))
+    assert rows == [{'url': 'https://other.com', 'input': 'https://other.com', 'row': None}]
@@ -0,0 +1,54 @@
+import json
+
+from scraper.platforms import detect_platform, extract_next_data, find_plan
+
+
+def next_page(props):
+    data = json.dumps({'props': {'pageProps': props}}).encode()
+    return (b'<html><head></head><body><div id="__next"></div>'
+            b'<script id="__NEXT_DATA__" type="application/json">' + data +
+            b'</script></body></html>')
+
+
+def test_plans_under_a_plans_key():
+    plan = find_plan({'nav': [{'name': 'Docs', 'amount': 3}],
+                      'plans': [{'name': 'Pro', 'price': 29, 'interval': 'month',
+                                 'features': ['SSO', {'name': 'Audit log'}]},
+                                {'name': 'Free', 'price': 0}]})
+    assert plan['plan_name'] == 'Pro'
+    assert plan['price'] == '$29'
+    assert plan['billing_period'] == 'month'
+    assert plan['features'] == ['SSO', 'Audit log']
+
+
+def test_lone_priced_object_is_not_a_plan():
+    assert find_plan({'nav': [{'name': 'Docs', 'amount': 3}], 'footer': {'title': 'x'}}) is None
+    assert find_plan({'counter': {'name': 'Downloads', 'price': '$3'}}) is None
+
+
+def test_priced_siblings_are_plans():
+    plan = find_plan({'cards': [{'title': 'Starter', 'amount': 9, 'currency': 'eur'},
+                                {'title': 'Team', 'amount': 19, 'currency': 'eur'}]})
+    assert (plan['plan_name'], plan['price']) == ('Starter', '€9')
+
+
+def test_plans_keyed_by_id():
+    plan = find_plan({'pricingTiers': {'pro': {'planName': 'Pro', 'monthlyPrice': '$12/mo'}}})
+    assert (plan['plan_name'], plan['price']) == ('Pro', '$12/mo')
+
+
+def test_stripe_cents_only_from_unit_amount():
+    plans = {'plans': [{'name': 'Pro', 'unit_amount': 2900, 'currency': 'usd'}]}
+    assert find_plan(plans)['price'] == '$29'
+    plans = {'plans': [{'name': 'Pro', 'price': 29, 'unit_amount': 2900}]}
+    assert find_plan(plans)['price'] == '$29'
+    plans = {'plans': [{'name': 'Pro', 'price': {'unitAmount': 1500, 'currency': 'gbp'}}]}
+    assert find_plan(plans)['price'] == '£15'
+
+
+def test_extract_next_data():
+    page = next_page({'pricing': {'plans': [{'name': 'Plus', 'price': '$10'}]}})
+    assert detect_platform(page) == 'nextjs'
+    assert extract_next_data(page)['plan_name'] == 'Plus'
+    assert extract_next_data(next_page({'nav': [{'name': 'Docs', 'amount': 3}]})) is None
+    assert extract_next_data(b'<html>no data</html>') is None
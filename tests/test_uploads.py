@@ -0,0 +1,57 @@
+from scraper.uploads import iter_multipart_file
+
+BOUNDARY = '----form7MA4YWxkTrZu0gW'
+
+
+def multipart(*parts):
+    body = b''
+    for headers, content in parts:
+        body += f'--{BOUNDARY}\r\n{headers}\r\n\r\n'.encode('latin-1') + content + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode('latin-1')
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+FILE = (b'domain\r\nnotion.so\r\nstripe.com\r\n'
+        # Looks like the delimiter but is not followed by the boundary
+        b'\r\n--not-the-boundary\r\nlinear.app\r\n')
+BODY = multipart(
+    ('Content-Disposition: form-data; name="note"', b'not the file'),
+    ('Content-Disposition: form-data; name="file"; filename="domains.csv"\r\n'
+     'Content-Type: text/csv', FILE),
+    ('Content-Disposition: form-data; name="after"', b'ignored'),
+)
+
+
+def test_every_chunk_size_yields_the_file_part():
+    for size in range(1, len(BODY) + 1):
+        assert b''.join(iter_multipart_file(chunked(BODY, size), BOUNDARY)) == FILE, size
+
+
+def test_delimiter_split_across_chunks():
+    delimiter = f'\r\n--{BOUNDARY}'.encode('latin-1')
+    end = BODY.index(FILE) + len(FILE)
+    assert BODY[end:].startswith(delimiter)
+    for cut in range(end, end + len(delimiter) + 1):
+        chunks = [BODY[:cut], BODY[cut:]]
+        assert b''.join(iter_multipart_file(chunks, BOUNDARY)) == FILE, cut
+
+
+def test_chunks_hold_back_at_most_the_delimiter():
+    content = b'x' * 10000
+    body = multipart(('Content-Disposition: form-data; name="file"; filename="a.txt"', content))
+    pieces = list(iter_multipart_file(chunked(body, 1000), BOUNDARY))
+    assert b''.join(pieces) == content
+    assert len(pieces) > 1
+
+
+def test_no_file_part():
+    body = multipart(('Content-Disposition: form-data; name="note"', b'hello'))
+    assert list(iter_multipart_file(chunked(body, 7), BOUNDARY)) == []
+
+
+def test_empty_file_part():
+    body = multipart(('Content-Disposition: form-data; name="file"; filename="a.csv"', b''))
+    assert b''.join(iter_multipart_file([body], BOUNDARY)) == b''
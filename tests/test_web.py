@@ -0,0 +1,38 @@
+import json
+
+from scraper.web import cacheable_json_response, cacheable_result, etag_matches
+
+PAYLOAD = cacheable_result({'url': 'https://a.com', 'price': '$9', 'timestamp': 1.5})
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc" ', '"abc"')
+    assert etag_matches('*', '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches('', '"abc"')
+
+
+def test_result_body_leaves_out_the_timestamp():
+    assert PAYLOAD['data'] == {'url': 'https://a.com', 'price': '$9'}
+    later = cacheable_result({'url': 'https://a.com', 'price': '$9', 'timestamp': 2.5})
+    first = cacheable_json_response({}, PAYLOAD)
+    assert cacheable_json_response({}, later)['headers']['ETag'] == first['headers']['ETag']
+
+
+def test_matching_if_none_match_gets_304():
+    first = cacheable_json_response({}, PAYLOAD)
+    assert first['statusCode'] == 200
+    assert json.loads(first['body']) == PAYLOAD
+    etag = first['headers']['ETag']
+
+    again = cacheable_json_response({'headers': {'If-None-Match': etag}}, PAYLOAD)
+    assert (again['statusCode'], again['body']) == (304, '')
+    assert again['headers']['ETag'] == etag
+    assert 's-maxage' in again['headers']['Cache-Control']
+
+    changed = dict(PAYLOAD, data={'price': '$10'})
+    fresh = cacheable_json_response({'headers': {'if-none-match': etag}}, changed)
+    assert fresh['statusCode'] == 200
+    assert fresh['headers']['ETag'] != etag